@@ -42,8 +42,10 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # =========================
 MIDDLEWARE = [
+    "accounting.middleware.RequestProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "accounting.routers.ReplicaPinMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -81,12 +83,50 @@ WSGI_APPLICATION = "AccountingProject.wsgi.application"
 # =========================
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        # Django's MySQL backend plus a per-process connection pool (accounting.db)
+        "ENGINE": "accounting.db.mysql",
         "NAME": "accounting_db",
         "USER": "root",
         "PASSWORD": "",
         "HOST": "127.0.0.1",
         "PORT": "3307",
+        # Connections go back to the pool at the end of each request...
+        "CONN_MAX_AGE": 0,
+        # ...and are pinged before being reused
+        "CONN_HEALTH_CHECKS": True,
+        # Remove POOL to open a fresh connection per request again
+        "POOL": {
+            "MAX_SIZE": int(os.environ.get("ACCOUNTING_DB_POOL_SIZE", 10)),  # per worker process
+            "MAX_AGE": 300,  # seconds before a connection is retired
+            "TIMEOUT": 5,  # seconds to wait for a free connection
+        },
+    }
+}
+
+# Optional read replica for the report pages (see accounting.routers).
+# Set ACCOUNTING_REPLICA_HOST to route report reads to a MySQL replica.
+if os.environ.get("ACCOUNTING_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ["ACCOUNTING_REPLICA_HOST"],
+        "PORT": os.environ.get("ACCOUNTING_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["accounting.routers.ReportReplicaRouter"]
+REPORT_REPLICA_ALIAS = "replica"  # ignored unless DATABASES has this alias
+REPORT_REPLICA_PIN_SECONDS = 10  # reads stay on the primary this long after a session writes
+
+# =========================
+# CACHE
+# =========================
+# LocMemCache is per process: an invalidation reaches only the worker that
+# made the change, and the others catch up when their entries time out.
+# With several workers, point this at a shared backend (Redis, Memcached).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "accounting",
     }
 }
 
@@ -167,6 +207,8 @@ MESSAGE_TAGS = {
 # =========================
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024 
+# Six fields per journal line: the default of 1000 rejects journals of ~160 lines
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 
 # =========================
 # LOGGING
@@ -188,6 +230,11 @@ LOGGING = {
             "level": "INFO",
             "class": "logging.StreamHandler",
         },
+        "profiling": {
+            "level": "INFO",
+            "class": "logging.FileHandler",
+            "filename": LOGS_DIR / "requests.log",
+        },
     },
     "loggers": {
         "django": {
@@ -195,5 +242,17 @@ LOGGING = {
             "level": "INFO",
             "propagate": True,
         },
+        # One JSON line per sampled request; WARNING when a query repeats (N+1)
+        "accounting.profiling": {
+            "handlers": ["profiling"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
+
+# =========================
+# REQUEST PROFILING
+# =========================
+REQUEST_PROFILING_SAMPLE_RATE = 1.0 if DEBUG else 0.05  # share of requests measured
+REQUEST_PROFILING_REPEAT_THRESHOLD = 5  # same statement more often than this is logged as an N+1
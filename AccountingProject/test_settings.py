@@ -0,0 +1,23 @@
+"""
+Settings for running the test suite without MySQL:
+
+    python manage.py test --settings=AccountingProject.test_settings
+
+Two SQLite databases; "replica" stands in for the read replica. Report
+routing is off by default and switched on by the routing tests.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "test_default.sqlite3",  # noqa: F405
+    },
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "test_replica.sqlite3",  # noqa: F405
+    },
+}
+
+REPORT_REPLICA_ALIAS = None
+REQUEST_PROFILING_SAMPLE_RATE = 0.0
@@ -25,9 +25,11 @@ urlpatterns = [
 
     # Journal
     path('journal/list/', accounting_views.journal_list_view, name='journal-list'),
+    path('journal/list/export/', accounting_views.journal_export_view, name='journal-export'),
     path('journal/create/', accounting_views.create_journal_view, name='journal-create'),
     path('journal/edit/<int:pk>/', accounting_views.update_journal_view, name='journal-edit'),
     path('journal/delete/<int:pk>/', accounting_views.delete_journal_view, name='journal-delete'),
+    path('journal/import/', accounting_views.import_journals_view, name='journal-import'),
 
     # Accounts
     path('accounts/', accounting_views.account_list_view, name='account-list'),
@@ -37,15 +39,25 @@ urlpatterns = [
 
     # AJAX
     path('ajax/add-account/', accounting_views.create_account_ajax, name='ajax-add-account'),
+    path('ajax/accounts/', accounting_views.account_autocomplete, name='account-autocomplete'),
 
     # ✅ FIX: Balance API 
     path('api/account/<int:account_id>/balance/', accounting_views.account_balance_api, name='account-balance-api'),
+    path('api/accounts/balances/', accounting_views.account_balances_api, name='account-balances-api'),
 
     # Reports
     path('ledger/<int:account_id>/', accounting_views.ledger_view, name='ledger'),
+    path('ledger/<int:account_id>/export/', accounting_views.ledger_export_view, name='ledger-export'),
     path('report/trial-balance/', accounting_views.trial_balance_view, name='trial-balance'),
+    path('report/trial-balance/export/', accounting_views.trial_balance_export_view, name='trial-balance-export'),
     path('report/income-statement/', accounting_views.income_statement_view, name='income-statement'),
     path('report/balance-sheet/', accounting_views.balance_sheet_view, name='balance-sheet'),
+
+    # Async reports (ASGI)
+    path('async/report/trial-balance/', accounting_views.trial_balance_async_view, name='trial-balance-async'),
+    path('async/report/income-statement/', accounting_views.income_statement_async_view, name='income-statement-async'),
+    path('async/report/balance-sheet/', accounting_views.balance_sheet_async_view, name='balance-sheet-async'),
+    path('async/api/account/<int:account_id>/balance/', accounting_views.account_balance_async_api, name='account-balance-api-async'),
 ]
 
 if settings.DEBUG:
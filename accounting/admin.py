@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
+from django.http import Http404
 from django.utils.html import format_html
 from .models import Account, Journal, Transaction, CompanySettings
+from .ledger import bump_ledger_version, journal_postings, lock_journals, record_posting_change
+from .search import index_journals, reindex_account
 
 
 # ===========================================
@@ -13,6 +17,22 @@ class AccountAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     ordering = ('name',)
 
+    # Names and types feed every report, so account edits move the ledger version on too
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_ledger_version()
+        if change and 'name' in form.changed_data:
+            reindex_account(obj.pk)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_ledger_version()
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            bump_ledger_version()
+
 
 # ===========================================
 # Transaction Inline 
@@ -38,6 +58,34 @@ class JournalAdmin(admin.ModelAdmin):
         return f"৳ {obj.get_total_amount():,.2f}"
     get_total_amount.short_description = 'Total Amount'
 
+    # Keep the monthly balance snapshots in sync with admin edits. The admin
+    # runs these inside its own transaction, which holds the row locks.
+    def save_model(self, request, obj, form, change):
+        if change and not lock_journals([obj.pk]):
+            raise Http404("This journal was deleted while it was being edited.")
+        obj._postings_before = journal_postings([obj.pk]) if change else {}
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        record_posting_change(obj._postings_before, journal_postings([obj.pk]))
+        index_journals([obj.pk])
+
+    def delete_model(self, request, obj):
+        if not lock_journals([obj.pk]):
+            return  # already deleted by another request
+        before = journal_postings([obj.pk])
+        super().delete_model(request, obj)
+        record_posting_change(before, {})
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            journal_ids = lock_journals(list(queryset.values_list('pk', flat=True)))
+            before = journal_postings(journal_ids)
+            super().delete_queryset(request, queryset.filter(pk__in=journal_ids))
+            record_posting_change(before, {})
+
 
 # ===========================================
 # Company Settings Admin 
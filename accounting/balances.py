@@ -0,0 +1,336 @@
+"""
+Balance engine.
+
+Computes debit/credit totals for every account in one query instead of
+calling Account.get_balance() (two aggregates) per account.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .ledger import last_closed_year
+from .models import Account, AccountPeriodBalance, OpeningBalance, Transaction, path_ids, signed_balance
+
+ZERO = Decimal('0')
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+class AccountBalance:
+    """Lightweight per-account balance row handed to report views and templates."""
+
+    __slots__ = ('id', 'name', 'account_type', 'debit', 'credit', 'balance', 'path')
+
+    def __init__(self, id, name, account_type, debit, credit, path=''):
+        self.id = id
+        self.name = name
+        self.account_type = account_type
+        self.debit = debit
+        self.credit = credit
+        self.balance = signed_balance(account_type, debit, credit)
+        self.path = path
+
+    def __repr__(self):
+        return f"<AccountBalance {self.name}: {self.balance}>"
+
+    @property
+    def balance_abs(self):
+        return abs(self.balance)
+
+    @property
+    def is_negative(self):
+        return self.balance < 0
+
+
+class TreeBalance(AccountBalance):
+    """
+    An AccountBalance whose figures cover the account and its
+    sub-accounts; the account's own row is kept as `own`.
+    """
+
+    __slots__ = ('depth', 'has_children', 'own')
+
+    def __init__(self, own, debit, credit, has_children):
+        super().__init__(own.id, own.name, own.account_type, debit, credit, own.path)
+        self.depth = max(len(path_ids(own.path)) - 1, 0)
+        self.has_children = has_children
+        self.own = own
+
+
+def balance_tree(rows):
+    """
+    `rows` in chart order, parents before their sub-accounts, as
+    TreeBalance rows rolled up over the sub-accounts among `rows`. Every
+    row's ancestors are read off the path it was queried with, in a single
+    pass and without any further query.
+    """
+    rows = sorted(rows, key=lambda row: row.path)
+    totals = {row.id: [row.debit, row.credit] for row in rows}
+    parents = set()
+    for row in rows:
+        for ancestor in path_ids(row.path)[:-1]:
+            if ancestor in totals:
+                totals[ancestor][0] += row.debit
+                totals[ancestor][1] += row.credit
+                parents.add(ancestor)
+    return [TreeBalance(row, *totals[row.id], row.id in parents) for row in rows]
+
+
+def subtree_balances(accounts=None):
+    """
+    TreeBalance rows of `accounts` (an Account queryset, the whole chart
+    when None) from the stored Posted totals, each rolled up over its whole
+    subtree in the same query (see AccountQuerySet.with_subtree_totals).
+    Sub-accounts need not be among `accounts`, so a filtered list still
+    shows complete totals.
+    """
+    if accounts is None:
+        accounts = Account.objects.order_by('path')
+    rows = accounts.with_subtree_totals().annotate(
+        has_children=Exists(Account.objects.filter(parent=OuterRef('pk'))),
+    ).values_list(
+        'id', 'name', 'account_type', 'debit_total', 'credit_total', 'path', 'subtree_debit', 'subtree_credit',
+        'has_children',
+    )
+    return [
+        TreeBalance(AccountBalance(pk, name, account_type, debit, credit, path), *subtree, has_children)
+        for pk, name, account_type, debit, credit, path, *subtree, has_children in rows
+    ]
+
+
+def _account_sum(queryset, field):
+    """Correlated per-account SUM(field) over `queryset`, zero when there are no rows."""
+    total = queryset.filter(account=OuterRef('pk')).order_by().values('account').annotate(
+        total=Sum(field)
+    ).values('total')
+    return Coalesce(Subquery(total), Value(ZERO), output_field=AMOUNT)
+
+
+def _sources_sum(querysets, field):
+    total = _account_sum(querysets[0], field)
+    for queryset in querysets[1:]:
+        total = total + _account_sum(queryset, field)
+    return total
+
+
+def opening_year(day):
+    """The latest year, up to `day`'s own, that has OpeningBalance rows (None when no earlier year is closed)."""
+    closed_through = last_closed_year(before=day.year)
+    return closed_through + 1 if closed_through is not None else None
+
+
+def balances_as_of(date=None, account_types=None, accounts=None):
+    """
+    Return an AccountBalance row for every account, using Posted journals
+    dated on or before `date` (all dates when None).
+
+    Undated balances are the Account.debit_total/credit_total columns. For
+    a date, whole months are read from the AccountPeriodBalance snapshots,
+    starting at the OpeningBalance rows of the latest year opened by a
+    fiscal close; only the partial month containing `date` is summed from
+    raw transactions.
+
+    `account_types` restricts the result to those types; `accounts` may be
+    an Account queryset to filter/order the chart of accounts further.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    if account_types:
+        accounts = accounts.filter(account_type__in=account_types)
+    if not date:
+        return [
+            AccountBalance(*row) for row in accounts.values_list(
+                'id', 'name', 'account_type', 'debit_total', 'credit_total', 'path'
+            )
+        ]
+
+    date = parse_report_date(date)
+    month_start = date.replace(day=1)
+    snapshots = AccountPeriodBalance.objects.filter(period__lt=month_start)
+    sources = [Transaction.objects.filter(posted_date__gte=month_start, posted_date__lte=date)]
+    year = opening_year(date)
+    if year:
+        # Earlier years are summed up in that year's opening rows
+        snapshots = snapshots.filter(period__gte=datetime.date(year, 1, 1))
+        sources.append(OpeningBalance.objects.filter(year=year))
+    sources.append(snapshots)
+    debit_sum = _sources_sum(sources, 'debit')
+    credit_sum = _sources_sum(sources, 'credit')
+
+    rows = accounts.annotate(
+        debit_sum=debit_sum, credit_sum=credit_sum,
+    ).values_list('id', 'name', 'account_type', 'debit_sum', 'credit_sum', 'path')
+
+    return [
+        AccountBalance(pk, name, account_type, debit or ZERO, credit or ZERO, path)
+        for pk, name, account_type, debit, credit, path in rows
+    ]
+
+
+def period_balances(date_from=None, date_to=None, status='Posted', account_types=None, accounts=None):
+    """
+    Return an AccountBalance row for every account, summing only the lines
+    of `status` journals (every journal when None) dated in [date_from,
+    date_to], in one grouped query (see AccountQuerySet.with_balances).
+    These are movements over the period, not closing balances, and include
+    any closing entries the period contains.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    if account_types:
+        accounts = accounts.filter(account_type__in=account_types)
+    rows = accounts.with_balances(
+        parse_report_date(date_from), parse_report_date(date_to), status,
+    ).values_list('id', 'name', 'account_type', 'debit_sum', 'credit_sum', 'path')
+    return [AccountBalance(*row) for row in rows]
+
+
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def period_buckets(end, unit='month', count=12):
+    """
+    (first day, last day) of the `count` calendar months, quarters or years
+    up to the one containing `end`, oldest first. The last one stops at `end`.
+    """
+    months = PERIOD_MONTHS[unit]
+    # Months since year 0 of the first month of the bucket containing `end`
+    index = end.year * 12 + (end.month - 1) // months * months
+    buckets = []
+    for step in range(count - 1, -1, -1):
+        first = index - step * months
+        start = datetime.date(first // 12, first % 12 + 1, 1)
+        following = first + months
+        last = datetime.date(following // 12, following % 12 + 1, 1) - datetime.timedelta(days=1)
+        buckets.append((start, min(last, end)))
+    return buckets
+
+
+def period_label(start, unit):
+    if unit == 'year':
+        return str(start.year)
+    if unit == 'quarter':
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+    return start.strftime('%b %Y')
+
+
+class ComparativeBalance:
+    """One account's signed balances, one per period column."""
+
+    __slots__ = ('id', 'name', 'account_type', 'balances')
+
+    def __init__(self, id, name, account_type, balances):
+        self.id = id
+        self.name = name
+        self.account_type = account_type
+        self.balances = balances
+
+    def __repr__(self):
+        return f"<ComparativeBalance {self.name}: {self.balances}>"
+
+
+def comparative_balances(periods, cumulative=False, account_types=None, exclude_closing=False):
+    """
+    A ComparativeBalance for every account with one balance per
+    (date_from, date_to) of `periods`, all from one pivoted query (see
+    AccountQuerySet.with_period_balances). Balances are movements over each
+    period, or closing balances at each period's end when `cumulative`.
+    """
+    accounts = Account.objects.all()
+    if account_types:
+        accounts = accounts.filter(account_type__in=account_types)
+    rows = accounts.with_period_balances(periods, cumulative, exclude_closing).values_list(
+        'id', 'name', 'account_type', *(f'{side}_{i}' for i in range(len(periods)) for side in ('debit', 'credit'))
+    )
+    return [
+        ComparativeBalance(pk, name, account_type, [
+            signed_balance(account_type, sums[i], sums[i + 1]) for i in range(0, len(sums), 2)
+        ])
+        for pk, name, account_type, *sums in rows
+    ]
+
+
+def journal_balances(date=None, status=None, accounts=None):
+    """
+    Like balances_as_of(), but summed straight from the transactions of
+    journals with `status` (every journal when None) dated on or before
+    `date`, in one grouped query. The snapshots only hold Posted journals,
+    so this is the path for Draft figures.
+    """
+    return period_balances(date_to=date, status=status, accounts=accounts)
+
+
+def totals_before(account_id, day, pk=None):
+    """
+    Posted (debit, credit) totals of one account strictly before `day`, or
+    before line `pk` on `day` when given (ledger order is posted_date, id).
+    Whole months come from the snapshots (and the opening row of the
+    latest closed-into year), so the cost does not grow with history.
+    """
+    month_start = day.replace(day=1)
+    snapshots = AccountPeriodBalance.objects.filter(account_id=account_id, period__lt=month_start)
+    opening_debit = opening_credit = ZERO
+    year = opening_year(day)
+    if year:
+        snapshots = snapshots.filter(period__gte=datetime.date(year, 1, 1))
+        opening = OpeningBalance.objects.filter(account_id=account_id, year=year).values_list('debit', 'credit').first()
+        opening_debit, opening_credit = opening or (ZERO, ZERO)
+    earlier = snapshots.aggregate(debit_sum=Sum('debit'), credit_sum=Sum('credit'))
+    before_day = Q(posted_date__lt=day)
+    if pk is not None:
+        before_day |= Q(posted_date=day, id__lt=pk)
+    partial = Transaction.objects.filter(
+        before_day, account_id=account_id, posted_date__gte=month_start
+    ).aggregate(debit_sum=Sum('debit'), credit_sum=Sum('credit'))
+    return (
+        opening_debit + (earlier['debit_sum'] or ZERO) + (partial['debit_sum'] or ZERO),
+        opening_credit + (earlier['credit_sum'] or ZERO) + (partial['credit_sum'] or ZERO),
+    )
+
+
+def parse_report_date(value):
+    """Accept a date or an ISO 'YYYY-MM-DD' string (as sent by the report filters); None stays None."""
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def total_balance(rows, account_type=None):
+    """Sum the balances of `rows`, optionally only those of one account type."""
+    return sum(
+        (row.balance for row in rows if account_type is None or row.account_type == account_type),
+        ZERO,
+    )
+
+
+def dashboard_figures(year):
+    """
+    Per-type balances, the monthly revenue (credits) and expense (debits)
+    series of `year`, and the years with posted activity, all from one pass
+    over the monthly snapshots grouped by (account type, month).
+    """
+    rows = AccountPeriodBalance.objects.exclude(debit=0, credit=0).values_list(
+        'account__account_type', 'period'
+    ).annotate(debit_sum=Sum('debit'), credit_sum=Sum('credit')).order_by()
+
+    totals, years = {}, set()
+    monthly_revenue, monthly_expense = [0] * 12, [0] * 12
+    for account_type, period, debit, credit in rows:
+        years.add(period.year)
+        total_debit, total_credit = totals.get(account_type, (ZERO, ZERO))
+        totals[account_type] = (total_debit + debit, total_credit + credit)
+        if period.year == year and account_type == 'Revenue':
+            monthly_revenue[period.month - 1] = float(credit)
+        elif period.year == year and account_type == 'Expense':
+            monthly_expense[period.month - 1] = float(debit)
+
+    return {
+        'type_balances': {
+            account_type: signed_balance(account_type, debit, credit)
+            for account_type, (debit, credit) in totals.items()
+        },
+        'monthly_revenue': monthly_revenue,
+        'monthly_expense': monthly_expense,
+        'available_years': sorted(years, reverse=True),
+    }
@@ -0,0 +1,117 @@
+"""
+View benchmarks.
+
+Times every GET-able accounting view of the root URLconf and counts its
+queries, so runs at different ledger sizes can be saved as JSON and
+compared with a baseline run (see the benchmark_views command).
+"""
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+
+from . import views
+from .models import Journal, Transaction
+from .report_cache import report_cache
+
+# Views that change data or only accept POST
+SKIPPED_VIEWS = {'logout', 'journal-delete', 'account-delete', 'journal-import', 'ajax-add-account'}
+
+
+def view_cases():
+    """(url name, kwarg names, query params) for every accounting view worth timing, plus filtered variants."""
+    last_year = date.today().year - 1
+    variants = {
+        'journal-list': [{'search': 'invoice'}],
+        'ledger': [{'from': f'{last_year}-01-01', 'to': f'{last_year}-12-31'}],
+        'trial-balance': [{'date': f'{last_year}-06-30'}],
+        'income-statement': [
+            {'date': f'{last_year}-06-30'}, {'from': f'{last_year}-04-01', 'date': f'{last_year}-06-30'},
+            {'compare': 'month', 'periods': 12},
+        ],
+        'balance-sheet': [{'date': f'{last_year}-06-30'}, {'compare': 'month', 'periods': 12}],
+        'balance-sheet-async': [{'date': f'{last_year}-06-30'}],
+        'dashboard': [{'year': last_year}],
+    }
+    cases = []
+    for pattern in get_resolver().url_patterns:
+        if not isinstance(pattern, URLPattern) or pattern.name in SKIPPED_VIEWS:
+            continue
+        if getattr(pattern.callback, '__module__', None) != views.__name__:
+            continue
+        kwarg_names = list(pattern.pattern.converters)
+        cases.append((pattern.name, kwarg_names, {}))
+        cases.extend((pattern.name, kwarg_names, params) for params in variants.get(pattern.name, []))
+    return cases
+
+
+def sample_kwargs():
+    """URL kwargs pointing at the busiest account and the newest journal."""
+    busiest = Transaction.objects.values('account').annotate(lines=Count('id')).order_by('-lines').first()
+    account_id = busiest['account'] if busiest else None
+    journal_id = Journal.objects.order_by('-id').values_list('pk', flat=True).first()
+    return {'account_id': account_id, 'account_pk': account_id, 'journal_pk': journal_id}
+
+
+def _url(name, kwarg_names, sample):
+    kwargs = {}
+    for arg in kwarg_names:
+        if arg == 'pk':
+            kwargs[arg] = sample['journal_pk'] if name.startswith('journal') else sample['account_pk']
+        else:
+            kwargs[arg] = sample[arg]
+    return reverse(name, kwargs=kwargs)
+
+
+def benchmark_views(client, repeat=3):
+    """
+    Return {label: {'url', 'status', 'queries', 'ms'}} for every view case.
+    Caches are cleared before each run so timings cover the real work; the
+    best of `repeat` runs is kept.
+    """
+    sample = sample_kwargs()
+    results = {}
+    for name, kwarg_names, params in view_cases():
+        url = _url(name, kwarg_names, sample)
+        label = name + ''.join(f' {key}={value}' for key, value in params.items())
+        best = None
+        for _ in range(max(repeat, 1)):
+            report_cache.clear()
+            cache.clear()
+            reset_queries()  # with DEBUG on, a full query log would hide new queries
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url, params)
+                if response.streaming:
+                    for _chunk in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = {
+            'url': url, 'status': response.status_code, 'queries': len(queries), 'ms': round(best * 1000, 2),
+        }
+    return results
+
+
+def find_regressions(results, baseline, max_slowdown=0.5, min_delta_ms=5.0):
+    """
+    Compare two benchmark_views command results. A case regresses when it
+    runs more queries than in `baseline`, or when it is more than
+    `max_slowdown` (a fraction) and more than `min_delta_ms` slower.
+    """
+    problems = []
+    for size, run in results['sizes'].items():
+        old_views = baseline.get('sizes', {}).get(size, {}).get('views', {})
+        for label, result in run['views'].items():
+            old = old_views.get(label)
+            if old is None:
+                continue
+            if result['queries'] > old['queries']:
+                problems.append(f"{size} lines, {label}: {old['queries']} -> {result['queries']} queries")
+            if result['ms'] > old['ms'] * (1 + max_slowdown) and result['ms'] - old['ms'] > min_delta_ms:
+                problems.append(f"{size} lines, {label}: {old['ms']:.1f} -> {result['ms']:.1f} ms")
+    return problems
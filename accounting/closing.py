@@ -0,0 +1,135 @@
+"""
+Fiscal year close.
+
+Fiscal years are calendar years. close_fiscal_year(year) does the
+following in one transaction:
+
+* posts a closing journal dated 31 December that moves every Revenue and
+  Expense balance into an Equity account, so income statement accounts
+  start each year at zero;
+* stores every account's totals at that point as the OpeningBalance rows
+  of the next year, so that as-of reports in later years start from one
+  row per account instead of summing every earlier month (see
+  accounting.balances).
+
+Years are closed in order. Once a year is closed, journals dated in it or
+any earlier year can no longer be changed: accounting.ledger refuses the
+posting change, and the journal form, delete view and importer check up
+front.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .balances import AccountBalance, balances_as_of
+from .ledger import bump_ledger_version, journal_postings, last_closed_year, record_posting_change
+from .models import Account, FiscalYearClose, Journal, OpeningBalance, Transaction
+from .search import index_journals
+
+ZERO = Decimal('0')
+RETAINED_EARNINGS = 'Retained Earnings'
+
+
+def closing_lines(year_end, equity_account):
+    """(account_id, debit, credit) lines zeroing Revenue and Expense as of `year_end` against `equity_account`."""
+    lines = []
+    net_profit = ZERO
+    for row in balances_as_of(year_end, account_types=['Revenue', 'Expense']):
+        if row.balance == 0:
+            continue
+        # Revenue is credit-normal and Expense debit-normal: post the opposite side
+        if (row.account_type == 'Revenue') == (row.balance > 0):
+            lines.append((row.id, abs(row.balance), ZERO))
+        else:
+            lines.append((row.id, ZERO, abs(row.balance)))
+        net_profit += row.balance if row.account_type == 'Revenue' else -row.balance
+    if net_profit > 0:
+        lines.append((equity_account.pk, ZERO, net_profit))
+    elif net_profit < 0:
+        lines.append((equity_account.pk, -net_profit, ZERO))
+    return lines
+
+
+def close_fiscal_year(year, equity_account=None):
+    """
+    Close `year` into `equity_account` (an Equity account; "Retained
+    Earnings" is created when omitted). Returns the FiscalYearClose.
+    Raises ValueError when the year cannot be closed.
+    """
+    if year >= datetime.date.today().year:
+        raise ValueError(f"Fiscal year {year} has not ended yet.")
+    if equity_account is None:
+        equity_account, _ = Account.objects.get_or_create(
+            name=RETAINED_EARNINGS, defaults={'account_type': 'Equity'},
+        )
+    if equity_account.account_type != 'Equity':
+        raise ValueError(f"{equity_account.name} is not an Equity account.")
+
+    year_end = datetime.date(year, 12, 31)
+    with transaction.atomic():
+        closed_through = last_closed_year()
+        if closed_through and year <= closed_through:
+            raise ValueError(f"Fiscal year {closed_through} is already closed.")
+
+        journal = None
+        lines = closing_lines(year_end, equity_account)
+        if lines:
+            journal = Journal.objects.create(date=year_end, description=f"Closing entries {year}", status='Posted')
+            Transaction.objects.bulk_create(
+                Transaction(journal=journal, account_id=account_id, debit=debit, credit=credit, posted_date=year_end)
+                for account_id, debit, credit in lines
+            )
+            record_posting_change({}, journal_postings([journal.pk]))
+            index_journals([journal.pk])
+
+        OpeningBalance.objects.bulk_create(
+            (
+                OpeningBalance(account_id=row.id, year=year + 1, debit=row.debit, credit=row.credit)
+                for row in balances_as_of(year_end) if row.debit or row.credit
+            ),
+            batch_size=500,
+        )
+        fiscal_close = FiscalYearClose.objects.create(
+            year=year, closing_journal=journal, equity_account=equity_account,
+        )
+        bump_ledger_version()
+    return fiscal_close
+
+
+def without_closing_entries(rows, day, date_from=None):
+    """
+    Balance rows as of `day` minus the closing entries dated that day, so
+    an income statement as of a closed year's last day still shows that
+    year's results. For period rows (see balances.period_balances), pass
+    `date_from` to take out every closing journal in [date_from, day].
+
+    Which of those years are closed is left to the query: a per-process
+    cache of closed years would go stale in every other worker after a close.
+    """
+    if date_from:
+        last = day or datetime.date.today()
+        first_year = date_from.year
+        last_year = last.year if (last.month, last.day) == (12, 31) else last.year - 1
+    elif day and (day.month, day.day) == (12, 31):
+        first_year = last_year = day.year
+    else:
+        return rows
+    if first_year > last_year:
+        return rows
+    closing = dict(
+        (account_id, (debit, credit))
+        for account_id, debit, credit in Transaction.objects.filter(
+            journal__fiscal_close__year__gte=first_year, journal__fiscal_close__year__lte=last_year,
+        ).order_by().values_list('account_id').annotate(Sum('debit'), Sum('credit'))
+    )
+    if not closing:
+        return rows
+    adjusted = []
+    for row in rows:
+        debit, credit = closing.get(row.id, (ZERO, ZERO))
+        adjusted.append(AccountBalance(
+            row.id, row.name, row.account_type, row.debit - debit, row.credit - credit, row.path,
+        ))
+    return adjusted
@@ -0,0 +1,45 @@
+"""
+Concurrent ORM calls for the async report views.
+
+run_concurrently() runs independent read-only calls, such as the sections
+of a report, on worker threads. Each thread has its own database
+connection, so a report costs as long as its slowest section instead of
+the sum of them all. A worker's connections are closed as soon as its call
+returns; with the pooled backends (accounting.db) that hands them back to
+the pool.
+
+Connections on other threads cannot see rows that are not committed yet.
+So when the calling thread is inside a transaction (ATOMIC_REQUESTS, or
+tests), the calls run one after another on the caller's connection
+instead.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def _closing(func):
+    def call():
+        try:
+            return func()
+        finally:
+            connections.close_all()
+    return call
+
+
+def _run_all(funcs):
+    return [func() for func in funcs]
+
+
+async def run_concurrently(*funcs):
+    """Call each zero-argument callable (use functools.partial) and return their results in order."""
+    if await sync_to_async(_in_transaction)():
+        return await sync_to_async(_run_all)(funcs)
+    return list(await asyncio.gather(*(
+        sync_to_async(_closing(func), thread_sensitive=False)() for func in funcs
+    )))
@@ -11,7 +11,7 @@ def site_settings(request):
     currency = "৳"
 
     try:
-        settings_obj = CompanySettings.objects.first()
+        settings_obj = CompanySettings.current()
 
         if settings_obj:
             if settings_obj.company_name:
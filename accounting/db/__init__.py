@@ -0,0 +1,10 @@
+"""
+Database backends with a per-process connection pool.
+
+Use ENGINE "accounting.db.mysql" (or "accounting.db.sqlite3") and add a
+POOL entry to the database settings:
+
+    "POOL": {"MAX_SIZE": 10, "MAX_AGE": 300, "TIMEOUT": 5}
+
+Without POOL they behave exactly like Django's own backends.
+"""
@@ -0,0 +1,14 @@
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from accounting.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, MySQLDatabaseWrapper):
+    def ping_connection(self, connection):
+        # ping() reconnects by default, which would hand out a fresh session
+        # without the pool noticing; a failed ping must make the pool drop it
+        try:
+            connection.ping(reconnect=False)
+        except Exception:
+            return False
+        return True
@@ -0,0 +1,226 @@
+"""
+Per-process pool of raw DB-API connections.
+
+Django opens a connection per thread and, with CONN_MAX_AGE = 0, closes
+it at the end of every request. PooledDatabaseWrapperMixin turns that
+close into a return to a process-wide pool, so the next request on any
+thread reuses the connection instead of paying for a new TCP/auth round
+trip. The pool caps the number of connections per worker process, retires
+connections older than MAX_AGE, pings idle connections before handing
+them out when CONN_HEALTH_CHECKS is on, and records how long callers
+waited for one.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+DEFAULT_MAX_SIZE = 10
+DEFAULT_MAX_AGE = 300
+DEFAULT_TIMEOUT = 5
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE, timeout=DEFAULT_TIMEOUT):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._idle = deque()  # (connection, opened at), most recently returned last
+        self._opened = {}  # id(connection) -> opened at, for every connection the pool owns
+        self._pid = os.getpid()
+        self.created = self.reused = self.discarded = self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+
+    def acquire(self, connect, check=None):
+        """
+        Return (connection, seconds waited). Reuses an idle connection when
+        one passes `check`, else opens a new one with connect() while under
+        max_size, else waits up to `timeout` for one to be released.
+        """
+        start = time.monotonic()
+        while True:
+            with self._condition:
+                self._check_fork()
+                while not self._idle and len(self._opened) >= self.max_size:
+                    remaining = start + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise OperationalError(
+                            f"No database connection available within {self.timeout}s "
+                            f"(pool of {self.max_size} in use)."
+                        )
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection, opened = self._idle.pop()
+                else:
+                    connection = None
+                    reserved = object()
+                    self._opened[id(reserved)] = time.monotonic()  # hold the slot while connecting
+
+            if connection is None:
+                try:
+                    connection = connect()
+                finally:
+                    with self._condition:
+                        del self._opened[id(reserved)]
+                        if connection is not None:
+                            self._opened[id(connection)] = time.monotonic()
+                            self.created += 1
+                        self._condition.notify()
+                return connection, self._waited(start)
+
+            if self._expired(opened) or (check is not None and not check(connection)):
+                self.discard(connection)
+                continue
+            with self._condition:
+                self.reused += 1
+            return connection, self._waited(start)
+
+    def release(self, connection):
+        """Hand a connection back for reuse (it must not be inside a transaction)."""
+        with self._condition:
+            opened = self._opened.get(id(connection))
+            if opened is None or os.getpid() != self._pid:
+                return
+            if self._expired(opened):
+                del self._opened[id(connection)]
+                self.discarded += 1
+                _close_quietly(connection)
+            else:
+                self._idle.append((connection, opened))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection and free its slot."""
+        with self._condition:
+            if self._opened.pop(id(connection), None) is not None:
+                self.discarded += 1
+            self._condition.notify()
+        _close_quietly(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': len(self._opened),
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'timeouts': self.timeouts,
+                'waits': self.waits,
+                'wait_total_ms': round(self.wait_total * 1000, 2),
+            }
+
+    def _expired(self, opened):
+        return self.max_age is not None and time.monotonic() - opened > self.max_age
+
+    def _waited(self, start):
+        waited = time.monotonic() - start
+        with self._condition:
+            self.waits += 1
+            self.wait_total += waited
+        return waited
+
+    def _check_fork(self):
+        # Connections inherited from a parent process must not be shared with it
+        if os.getpid() != self._pid:
+            self._idle.clear()
+            self._opened.clear()
+            self._pid = os.getpid()
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def get_pool(alias, settings_dict):
+    """The pool for database `alias`, or None when its settings have no POOL entry ({} means defaults)."""
+    options = settings_dict.get('POOL')
+    if options is None:
+        return None
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                max_size=options.get('MAX_SIZE', DEFAULT_MAX_SIZE),
+                max_age=options.get('MAX_AGE', DEFAULT_MAX_AGE),
+                timeout=options.get('TIMEOUT', DEFAULT_TIMEOUT),
+            )
+        return pool
+
+
+def close_pool(alias):
+    """Close the idle connections of `alias` and forget its pool; in-use ones close when released."""
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        while True:
+            with pool._condition:
+                if not pool._idle:
+                    break
+                connection, opened = pool._idle.pop()
+            pool.discard(connection)
+
+
+def pool_stats():
+    """stats() of every pool in this process, keyed by database alias."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    """Mixed into a backend's DatabaseWrapper to draw its connections from the alias's pool."""
+
+    # Seconds this wrapper (one per thread) has spent waiting for pooled connections
+    connection_wait = 0.0
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        connect = super().get_new_connection
+        if pool is None:
+            return connect(conn_params)
+        check = self.ping_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None
+        connection, waited = pool.acquire(lambda: connect(conn_params), check)
+        self.connection_wait += waited
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        try:
+            if not self.autocommit or self.in_atomic_block:
+                connection.rollback()
+        except Exception:
+            pool.discard(connection)
+        else:
+            pool.release(connection)
+
+    def ping_connection(self, connection):
+        """Health check run on an idle connection before it is reused."""
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
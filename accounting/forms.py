@@ -1,7 +1,8 @@
 from django import forms
-from django.forms import inlineformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory
 from django.contrib.auth.models import User
-from .models import Journal, Transaction, Account
+from .models import Journal, Transaction, Account, subtree
+from .validation import line_error
 
 
 
@@ -39,18 +40,36 @@ class UserRegistrationForm(forms.ModelForm):
 # ==========================================
 # 2. Account Management Form
 # ==========================================
+class ParentAccountField(forms.ModelChoiceField):
+    """Accounts in chart order, indented by depth."""
+
+    def label_from_instance(self, obj):
+        return f"{'— ' * obj.depth}{obj.name} ({obj.account_type})"
+
+
 class AccountForm(forms.ModelForm):
     class Meta:
         model = Account
-        fields = ['name', 'account_type']
+        fields = ['name', 'account_type', 'parent']
+        field_classes = {'parent': ParentAccountField}
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control', 
                 'placeholder': 'e.g. Cash, Bank Account, Sales'
             }),
             'account_type': forms.Select(attrs={'class': 'form-select'}),
+            'parent': forms.Select(attrs={'class': 'form-select'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        parents = Account.objects.order_by('path')
+        if self.instance.pk:
+            # Neither the account itself nor its sub-accounts can become its parent
+            parents = parents.exclude(subtree(self.instance.path))
+        self.fields['parent'].queryset = parents
+        self.fields['parent'].empty_label = "— None (top-level account) —"
+
 
 # ==========================================
 # 3.Journal Header Form
@@ -75,10 +94,47 @@ class JournalForm(forms.ModelForm):
 # ==========================================
 # 4. Transaction line Form
 # ==========================================
+class AccountChoiceField(forms.ModelChoiceField):
+    """Looks submitted account ids up in `accounts`, when the formset has set it, instead of one query each."""
+    accounts = None
+
+    def to_python(self, value):
+        if self.accounts is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            return self.accounts[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+
+
+class ExistingLineField(forms.ModelChoiceField):
+    """The hidden id of an existing line, looked up among the lines the formset has already loaded."""
+
+    def __init__(self, formset, *args, **kwargs):
+        self.formset = formset
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            line = self.formset._existing_object(int(value))
+        except (TypeError, ValueError):
+            line = None
+        if line is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+        return line
+
+
 class TransactionForm(forms.ModelForm):
     class Meta:
         model = Transaction
         fields = ['account', 'debit', 'credit']
+        field_classes = {'account': AccountChoiceField}
         widgets = {
             'account': forms.Select(attrs={
                 'class': 'form-control account-select'
@@ -95,9 +151,14 @@ class TransactionForm(forms.ModelForm):
             }),
         }
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, account_names=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['account'].queryset = Account.objects.all().order_by('name')
+        # Only the selected account is rendered as an option; the select looks
+        # others up through the account-autocomplete endpoint.
+        self.fields['account'].choices = self.account_choices(
+            Account.names() if account_names is None else account_names
+        )
         
         self.fields['account'].required = False
         self.fields['debit'].required = False
@@ -118,27 +179,94 @@ class TransactionForm(forms.ModelForm):
             return cleaned_data
         
         
-        if (debit > 0 or credit > 0) and not account:
-            raise forms.ValidationError("Please select an account.")
-        
-        
-        if debit > 0 and credit > 0:
-            raise forms.ValidationError("Enter either Debit or Credit, not both.")
-        
-       
-        if debit < 0 or credit < 0:
-            raise forms.ValidationError("Negative amounts are not allowed.")
+        error = line_error(account, debit, credit)
+        if error:
+            raise forms.ValidationError(error)
         
         return cleaned_data
 
+    def account_choices(self, names):
+        if self.is_bound:
+            selected = self.data.get(self.add_prefix('account'))
+        else:
+            selected = self.initial.get('account', self.instance.account_id)
+        choices = [('', self.fields['account'].empty_label)]
+        try:
+            selected = int(selected)
+        except (TypeError, ValueError):
+            return choices
+        name = names.get(selected)
+        if name is None:
+            # The cached chart can miss an account another worker added just now
+            name = Account.objects.filter(pk=selected).values_list('name', flat=True).first()
+        if name is not None:
+            choices.append((selected, name))
+        return choices
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if self.fields['account'].accounts is not None:
+            # The field resolved the id against existing accounts already; skip the model's per-line exists() query
+            exclude.add('account')
+        return exclude
+
 
 # ==========================================
 # 5. TransactionFormSet (Final Setup)
 # ==========================================
+class BaseTransactionFormSet(BaseInlineFormSet):
+    """
+    Validates every line against one load of the submitted accounts and of
+    the journal's lines. Unbound formsets render every line from one copy
+    of the cached account names instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accounts = None
+        self.account_names = None
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        if self.account_names is None:
+            if self.is_bound:
+                self.accounts = Account.objects.in_bulk(self.submitted_account_ids())
+                self.account_names = {pk: account.name for pk, account in self.accounts.items()}
+            else:
+                self.account_names = Account.names()
+        kwargs['account_names'] = self.account_names
+        return kwargs
+
+    def submitted_account_ids(self):
+        """The account ids posted for the lines, so a save loads those accounts and not the whole chart."""
+        ids = set()
+        for i in range(self.total_form_count()):
+            try:
+                ids.add(int(self.data.get(f'{self.add_prefix(i)}-account')))
+            except (TypeError, ValueError):
+                pass  # blank or malformed: the field reports it
+        return ids
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if self.accounts is not None:
+            form.fields['account'].accounts = self.accounts
+        return form
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        field = form.fields.get(self._pk_field.name)
+        if self.is_bound and isinstance(field, forms.ModelChoiceField):
+            form.fields[self._pk_field.name] = ExistingLineField(
+                self, field.queryset, initial=field.initial, required=False, widget=field.widget,
+            )
+
+
 TransactionFormSet = inlineformset_factory(
     Journal,
     Transaction,
     form=TransactionForm,
+    formset=BaseTransactionFormSet,
     extra=1,          
     can_delete=True, 
     min_num=1,       
@@ -0,0 +1,251 @@
+"""
+Bulk journal import.
+
+Reads journals from CSV (one row per line, grouped by a `journal` key) or
+JSON Lines (one journal object per line) as a stream, validates each one
+with the same rules as the journal form, and inserts valid journals with
+bulk_create inside one transaction per batch. Invalid journals are skipped
+and reported with the source row they started on.
+
+CSV columns: journal, date, description, status, account, debit, credit
+JSON line:   {"date": ..., "description": ..., "status": ..., "lines": [
+                 {"account": ..., "debit": ..., "credit": ...}, ...]}
+
+Accounts are referenced by name (case-insensitive) or numeric id.
+
+Lines and search tokens are written with a plain executemany() rather than
+bulk_create(), and each batch's snapshot deltas with one upsert per chunk.
+
+Throughput falls well short of the 50k lines per second first aimed for:
+on a file-backed SQLite database, 100k lines over 200 accounts and six
+years import at about 10-12k lines per second. Inserting the lines and
+their search tokens into their indexed tables takes about half of that
+time alone, so SQLite tops out near 25k lines per second however lean
+the rest (parsing, validation, journal headers, snapshots) gets.
+"""
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, connection, transaction
+
+from .ledger import ZERO, ClosedPeriodError, last_closed_year, record_posting_change
+from .models import Account, Journal, JournalSearchToken, Transaction
+from .search import journal_tokens
+from .validation import closed_period_error, journal_error, line_error
+
+BATCH_SIZE = 2000
+STATUSES = {choice for choice, label in Journal.STATUS_CHOICES}
+
+
+class ImportReport:
+    def __init__(self):
+        self.journals = 0
+        self.lines = 0
+        self.errors = []
+
+    def add_error(self, row, message):
+        self.errors.append({'row': row, 'message': message})
+
+    def as_dict(self):
+        return {'journals': self.journals, 'lines': self.lines, 'errors': self.errors}
+
+
+class JournalRecord:
+    """One journal read from the source, before validation."""
+
+    def __init__(self, row, date, description, status, lines):
+        self.row = row
+        self.date = date
+        self.description = description
+        self.status = status or 'Posted'
+        self.lines = lines  # [(account, debit, credit), ...] as read
+
+
+def read_csv(stream):
+    """Yield a JournalRecord per run of consecutive rows sharing a `journal` key."""
+    reader = csv.DictReader(stream)
+    record, key = None, object()
+    for row_number, row in enumerate(reader, start=2):
+        if row.get('journal') != key or record is None:
+            if record is not None:
+                yield record
+            key = row.get('journal')
+            record = JournalRecord(row_number, row.get('date'), row.get('description'), row.get('status'), [])
+        record.lines.append((row.get('account'), row.get('debit'), row.get('credit')))
+    if record is not None:
+        yield record
+
+
+def read_json_lines(stream):
+    """Yield a JournalRecord per non-blank JSON line."""
+    for row_number, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+            lines = [(line.get('account'), line.get('debit'), line.get('credit')) for line in data.get('lines', [])]
+            record = JournalRecord(row_number, data.get('date'), data.get('description'), data.get('status'), lines)
+        except (ValueError, AttributeError, TypeError):
+            record = JournalRecord(row_number, None, None, None, None)
+        yield record
+
+
+CENT = Decimal('0.01')
+MAX_AMOUNT = Decimal('1e10')  # Transaction amounts are max_digits=12, decimal_places=2
+
+
+def _amount(value):
+    if value in (None, ''):
+        return ZERO
+    amount = Decimal(str(value).replace(',', ''))
+    if not amount.is_finite() or amount != amount.quantize(CENT) or abs(amount) >= MAX_AMOUNT:
+        raise InvalidOperation(value)
+    return amount
+
+
+def _bulk_insert(model, fields, rows, batch_size):
+    """INSERT `rows` (tuples in `fields` order) with executemany, `batch_size` rows at a time."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+class Importer:
+    def __init__(self, batch_size=BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.report = ImportReport()
+        self.accounts = {}
+        names = dict(Account.objects.values_list('name', 'pk'))
+        self.account_names = {pk: name for name, pk in names.items()}
+        # Names win over ids when an account is literally named like another's id
+        self.accounts.update((str(pk), pk) for pk in names.values())
+        self.accounts.update((name.lower(), pk) for name, pk in names.items())
+        self.closed_through = last_closed_year()
+
+    def run(self, records):
+        batch = []
+        for record in records:
+            validated = self.validate(record)
+            if validated is None:
+                continue
+            batch.append(validated)
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        return self.report
+
+    def validate(self, record):
+        """Return (record, Journal, [(account_id, debit, credit), ...]) or None after reporting the error."""
+        if record.lines is None:
+            self.report.add_error(record.row, "Malformed journal record.")
+            return None
+        try:
+            journal_date = date.fromisoformat(str(record.date).strip())
+        except ValueError:
+            self.report.add_error(record.row, f"Invalid date: {record.date!r}")
+            return None
+        error = closed_period_error(self.closed_through, journal_date)
+        if error:
+            self.report.add_error(record.row, error)
+            return None
+        if record.status not in STATUSES:
+            self.report.add_error(record.row, f"Invalid status: {record.status!r}")
+            return None
+
+        lines = []
+        total_debit = total_credit = ZERO
+        for account_ref, debit, credit in record.lines:
+            try:
+                debit, credit = _amount(debit), _amount(credit)
+            except InvalidOperation:
+                self.report.add_error(record.row, f"Invalid amount on account {account_ref!r}.")
+                return None
+            account_ref = str(account_ref or '').strip()
+            account_id = self.accounts.get(account_ref.lower())
+            if debit == 0 and credit == 0:
+                continue
+            if account_ref and account_id is None:
+                self.report.add_error(record.row, f"Unknown account: {account_ref!r}")
+                return None
+            error = line_error(account_id, debit, credit)
+            if error:
+                self.report.add_error(record.row, error)
+                return None
+            total_debit += debit
+            total_credit += credit
+            lines.append((account_id, debit, credit))
+
+        error = journal_error(record.status, len(lines), total_debit, total_credit)
+        if error:
+            self.report.add_error(record.row, error)
+            return None
+        journal = Journal(date=journal_date, description=record.description or '', status=record.status)
+        return record, journal, lines
+
+    def flush(self, batch):
+        """Insert one batch of validated journals in a single transaction."""
+        if self.dry_run:
+            self.report.journals += len(batch)
+            self.report.lines += sum(len(lines) for record, journal, lines in batch)
+            return
+        try:
+            with transaction.atomic():
+                journals = [journal for record, journal, lines in batch]
+                if connection.features.can_return_rows_from_bulk_insert:
+                    Journal.objects.bulk_create(journals)
+                else:
+                    # MySQL does not report auto-increment ids from a bulk INSERT
+                    for journal in journals:
+                        journal.save()
+                transactions, tokens, postings = [], [], {}
+                for record, journal, lines in batch:
+                    posted_date = journal.posted_date
+                    transactions.extend(
+                        (journal.pk, account_id, debit, credit, posted_date)
+                        for account_id, debit, credit in lines
+                    )
+                    if posted_date:
+                        # Same shape as ledger.journal_postings(), built without re-reading the rows
+                        period = posted_date.replace(day=1)
+                        for account_id, debit, credit in lines:
+                            old_debit, old_credit = postings.get((account_id, period), (ZERO, ZERO))
+                            postings[account_id, period] = (old_debit + debit, old_credit + credit)
+                    names = {self.account_names[account_id] for account_id, debit, credit in lines}
+                    tokens.extend(
+                        (journal.pk, token, weight)
+                        for token, weight in journal_tokens(journal.description, names).items()
+                    )
+                _bulk_insert(
+                    Transaction, ['journal', 'account', 'debit', 'credit', 'posted_date'],
+                    transactions, self.batch_size,
+                )
+                _bulk_insert(JournalSearchToken, ['journal', 'token', 'weight'], tokens, self.batch_size)
+                record_posting_change({}, postings)
+        except DatabaseError as e:
+            for record, journal, lines in batch:
+                self.report.add_error(record.row, f"Database error, batch rolled back: {e}")
+            return
+        except ClosedPeriodError as e:
+            # A year was closed while the import ran
+            for record, journal, lines in batch:
+                self.report.add_error(record.row, f"{e} Batch rolled back.")
+            return
+        self.report.journals += len(batch)
+        self.report.lines += len(transactions)
+
+
+def import_journals(stream, fmt='csv', batch_size=BATCH_SIZE, dry_run=False):
+    """Import journals from a text stream in `fmt` ('csv' or 'jsonl'); returns an ImportReport."""
+    readers = {'csv': read_csv, 'jsonl': read_json_lines}
+    if fmt not in readers:
+        raise ValueError(f"Unsupported import format: {fmt!r}")
+    return Importer(batch_size=batch_size, dry_run=dry_run).run(readers[fmt](stream))
@@ -0,0 +1,262 @@
+"""
+Ledger maintenance.
+
+Keeps AccountPeriodBalance (per-account, per-month Posted totals) and the
+Account.debit_total/credit_total columns (all-time Posted totals) in step
+with journal changes. Callers capture a journal's postings before they
+change it, and hand the before/after pair to record_posting_change()
+inside the same database transaction.
+
+Every such change also bumps the LedgerVersion counter, which report
+caches use as part of their keys, and is refused with ClosedPeriodError
+when it touches a closed fiscal year.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Account, AccountPeriodBalance, FiscalYearClose, Journal, LedgerVersion, Transaction
+from .validation import closed_period_error
+
+ZERO = Decimal('0')
+BULK_THRESHOLD = 50  # snapshot rows touched by one change before switching to bulk statements
+
+
+class ClosedPeriodError(Exception):
+    pass
+
+
+def _grouped_postings(transactions, date_field='posted_date'):
+    rows = transactions.annotate(
+        period=TruncMonth(date_field)
+    ).order_by().values('account_id', 'period').annotate(
+        debit_sum=Sum('debit'), credit_sum=Sum('credit')
+    )
+    return {
+        (row['account_id'], row['period']): (row['debit_sum'] or ZERO, row['credit_sum'] or ZERO)
+        for row in rows
+    }
+
+
+def journal_postings(journal_ids):
+    """Posted debit/credit totals of the given journals keyed by (account_id, period)."""
+    return _grouped_postings(Transaction.objects.filter(journal_id__in=journal_ids, posted_date__isnull=False))
+
+
+def lock_journals(journal_ids):
+    """
+    Lock the given journal rows until the transaction ends and return the ids
+    that still exist. Take it before reading journal_postings() for a change,
+    so two requests editing or deleting one journal cannot apply the same
+    `before` twice.
+    """
+    return set(
+        Journal.objects.select_for_update().filter(pk__in=journal_ids).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def _ledger_postings():
+    # Rebuild/check read the journal header itself rather than the denormalized posted_date
+    return _grouped_postings(Transaction.objects.filter(journal__status='Posted'), 'journal__date')
+
+
+def record_posting_change(before, after):
+    """Apply the difference between two journal_postings() results to the snapshot table."""
+    bump_ledger_version()
+    deltas = {}
+    for key in before.keys() | after.keys():
+        old_debit, old_credit = before.get(key, (ZERO, ZERO))
+        new_debit, new_credit = after.get(key, (ZERO, ZERO))
+        debit, credit = new_debit - old_debit, new_credit - old_credit
+        if debit != 0 or credit != 0:
+            deltas[key] = (debit, credit)
+    if deltas:
+        # Opening balances of later years were computed from these periods
+        error = closed_period_error(last_closed_year(), min(period for account_id, period in deltas))
+        if error:
+            raise ClosedPeriodError(error)
+
+    account_deltas = {}
+    for (account_id, period), (debit, credit) in deltas.items():
+        old_debit, old_credit = account_deltas.get(account_id, (ZERO, ZERO))
+        account_deltas[account_id] = (old_debit + debit, old_credit + credit)
+    _add_to_accounts(account_deltas)
+
+    if len(deltas) > BULK_THRESHOLD:
+        _add_to_periods(deltas)
+        return
+    for key, (debit, credit) in deltas.items():
+        _add_to_period(*key, debit, credit)
+
+
+def _add_to_accounts(deltas):
+    """Add {account_id: (debit, credit)} to the Account totals, in id order so concurrent postings lock alike."""
+    rows = [(debit, credit, account_id) for account_id, (debit, credit) in sorted(deltas.items())]
+    if len(rows) <= BULK_THRESHOLD:
+        for debit, credit, account_id in rows:
+            Account.objects.filter(pk=account_id).update(
+                debit_total=F('debit_total') + debit, credit_total=F('credit_total') + credit,
+            )
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {quote(Account._meta.db_table)} SET {quote('debit_total')} = {quote('debit_total')} + %s, "
+            f"{quote('credit_total')} = {quote('credit_total')} + %s WHERE {quote('id')} = %s",
+            rows,
+        )
+
+
+def _add_to_period(account_id, period, debit, credit):
+    snapshots = AccountPeriodBalance.objects.filter(account_id=account_id, period=period)
+    if snapshots.update(debit=F('debit') + debit, credit=F('credit') + credit):
+        return
+    try:
+        with transaction.atomic():
+            AccountPeriodBalance.objects.create(account_id=account_id, period=period, debit=debit, credit=credit)
+    except IntegrityError:
+        # Another request created the row first; add on top of it.
+        snapshots.update(debit=F('debit') + debit, credit=F('credit') + credit)
+
+
+def _add_to_periods(deltas):
+    """
+    Bulk form of _add_to_period for large batches such as imports: one
+    multi-row upsert per chunk adds each delta onto its snapshot row,
+    creating the row when it is missing, without reading the table first.
+    """
+    features = connection.features
+    quote = connection.ops.quote_name
+    table = quote(AccountPeriodBalance._meta.db_table)
+    debit, credit = quote('debit'), quote('credit')
+    if features.supports_update_conflicts_with_target:
+        conflict = (
+            f"ON CONFLICT ({quote('account_id')}, {quote('period')}) DO UPDATE SET "
+            f"{debit} = {table}.{debit} + excluded.{debit}, {credit} = {table}.{credit} + excluded.{credit}"
+        )
+    elif features.supports_update_conflicts:
+        conflict = f"ON DUPLICATE KEY UPDATE {debit} = {debit} + VALUES({debit}), {credit} = {credit} + VALUES({credit})"
+    else:
+        for key, (debit_delta, credit_delta) in deltas.items():
+            _add_to_period(*key, debit_delta, credit_delta)
+        return
+    # In (account, period) order so concurrent imports lock rows alike
+    rows = [
+        (account_id, period, debit_delta, credit_delta)
+        for (account_id, period), (debit_delta, credit_delta) in sorted(deltas.items())
+    ]
+    chunk = connection.ops.bulk_batch_size(['account', 'period', 'debit', 'credit'], rows)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), chunk):
+            batch = rows[start:start + chunk]
+            values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({quote('account_id')}, {quote('period')}, {debit}, {credit}) "
+                f"VALUES {values} {conflict}",
+                [param for row in batch for param in row],
+            )
+
+
+def last_closed_year(before=None):
+    """
+    The latest closed fiscal year, or the latest one before year `before`
+    (None when there is none), read from the database rather than a cache.
+    """
+    closes = FiscalYearClose.objects.all()
+    if before is not None:
+        closes = closes.filter(year__lt=before)
+    return closes.aggregate(year=Max('year'))['year']
+
+
+def ledger_version():
+    """Current ledger version."""
+    return LedgerVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def bump_ledger_version():
+    """Advance the ledger version; call inside the transaction that changes the ledger."""
+    versions = LedgerVersion.objects.filter(pk=1)
+    if versions.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            LedgerVersion.objects.create(pk=1, version=1)
+    except IntegrityError:
+        versions.update(version=F('version') + 1)
+
+
+def rebuild_period_balances(batch_size=1000):
+    """Recompute the whole snapshot table from Posted transactions. Returns the row count."""
+    postings = _ledger_postings()
+    with transaction.atomic():
+        bump_ledger_version()
+        AccountPeriodBalance.objects.all().delete()
+        AccountPeriodBalance.objects.bulk_create(
+            (
+                AccountPeriodBalance(account_id=account_id, period=period, debit=debit, credit=credit)
+                for (account_id, period), (debit, credit) in postings.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(postings)
+
+
+def check_period_balances():
+    """
+    Compare the snapshot table with raw Transaction sums.
+    Returns a list of (account_id, period, expected, stored) mismatches,
+    where expected/stored are (debit, credit) pairs.
+    """
+    expected = _ledger_postings()
+    stored = {
+        (row.account_id, row.period): (row.debit, row.credit)
+        for row in AccountPeriodBalance.objects.all()
+    }
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want = expected.get(key, (ZERO, ZERO))
+        have = stored.get(key, (ZERO, ZERO))
+        if want != have:
+            mismatches.append((key[0], key[1], want, have))
+    return mismatches
+
+
+def _posted_account_totals(account_ids=None):
+    transactions = Transaction.objects.filter(journal__status='Posted')
+    if account_ids is not None:
+        transactions = transactions.filter(account_id__in=account_ids)
+    rows = transactions.order_by().values('account_id').annotate(debit_sum=Sum('debit'), credit_sum=Sum('credit'))
+    return {row['account_id']: (row['debit_sum'] or ZERO, row['credit_sum'] or ZERO) for row in rows}
+
+
+def check_account_totals():
+    """
+    Compare Account.debit_total/credit_total with raw Posted Transaction sums.
+    Returns a list of (account_id, expected, stored) mismatches, where
+    expected/stored are (debit, credit) pairs.
+    """
+    expected = _posted_account_totals()
+    mismatches = []
+    for account_id, debit, credit in Account.objects.order_by('pk').values_list('pk', 'debit_total', 'credit_total'):
+        want = expected.get(account_id, (ZERO, ZERO))
+        if want != (debit, credit):
+            mismatches.append((account_id, want, (debit, credit)))
+    return mismatches
+
+
+def fix_account_totals(account_ids):
+    """Recompute the totals of the given accounts from Posted transactions."""
+    with transaction.atomic():
+        # Locking the rows first makes postings that race with the fix wait
+        # and add their delta on top of the recomputed value.
+        locked = list(Account.objects.select_for_update().filter(pk__in=account_ids).order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        expected = _posted_account_totals(locked)
+        for account_id in locked:
+            debit, credit = expected.get(account_id, (ZERO, ZERO))
+            Account.objects.filter(pk=account_id).update(debit_total=debit, credit_total=credit)
+        bump_ledger_version()
+    return len(locked)
@@ -0,0 +1,106 @@
+import json
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from accounting.benchmark import benchmark_views, find_regressions
+from accounting.models import Transaction
+from accounting.synthetic import generate_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Time and count the queries of every accounting view against synthetic ledgers of "
+        "increasing size, built in a throwaway test database. Writes JSON results and fails "
+        "when --baseline shows a regression."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help="Ledger sizes in transaction lines")
+        parser.add_argument('--accounts', type=int, default=200)
+        parser.add_argument('--lines-per-journal', type=int, default=3)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--draft-ratio', type=float, default=0.05)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per view; the best is kept")
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the JSON results")
+        parser.add_argument('--baseline', help="Earlier results to compare against")
+        parser.add_argument('--max-slowdown', type=float, default=0.5,
+                            help="Allowed slowdown against the baseline, as a fraction")
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help="Ignore slowdowns smaller than this, which are timer noise")
+        parser.add_argument('--current', metavar='USERNAME',
+                            help="Benchmark the configured database as-is, logged in as USERNAME")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        setup_test_environment()
+        try:
+            if options['current']:
+                sizes = self.run_current(options)
+            else:
+                sizes = self.run_synthetic(options)
+        finally:
+            teardown_test_environment()
+
+        results = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'vendor': connection.vendor,
+            'repeat': options['repeat'],
+            'sizes': sizes,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            problems = find_regressions(results, baseline, options['max_slowdown'], options['min_delta_ms'])
+            if problems:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(problems))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run_current(self, options):
+        user = User.objects.filter(username=options['current']).first()
+        if user is None:
+            raise CommandError(f"No user named {options['current']!r}.")
+        lines = Transaction.objects.count()
+        return {str(lines): self.measure(user, lines, options)}
+
+    def run_synthetic(self, options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = User.objects.create_user('benchmark')
+            sizes, generated = {}, 0
+            for size in sorted(options['sizes']):
+                report = generate_ledger(
+                    size - generated, accounts=options['accounts'], lines_per_journal=options['lines_per_journal'],
+                    years=options['years'], draft_ratio=options['draft_ratio'], seed=size,
+                )
+                generated += report.lines
+                sizes[str(size)] = self.measure(user, generated, options)
+            return sizes
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def measure(self, user, lines, options):
+        client = Client()
+        client.force_login(user)
+        views = benchmark_views(client, options['repeat'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {lines:,} lines"))
+        for label, result in views.items():
+            self.stdout.write(
+                f"{label:<45} {result['status']:>4} {result['queries']:>4} queries {result['ms']:>10.1f} ms"
+            )
+        return {'lines': lines, 'views': views}
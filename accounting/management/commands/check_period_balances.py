@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.ledger import check_period_balances
+
+
+class Command(BaseCommand):
+    help = "Compare AccountPeriodBalance snapshots against raw Transaction sums."
+
+    def handle(self, *args, **options):
+        mismatches = check_period_balances()
+        for account_id, period, expected, stored in mismatches:
+            self.stdout.write(
+                f"account={account_id} period={period:%Y-%m} "
+                f"expected Dr:{expected[0]} Cr:{expected[1]} stored Dr:{stored[0]} Cr:{stored[1]}"
+            )
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} snapshot rows out of sync; run rebuild_period_balances to fix."
+            )
+        self.stdout.write(self.style.SUCCESS("Account period balances are consistent."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.closing import RETAINED_EARNINGS, close_fiscal_year
+from accounting.models import Account
+
+
+class Command(BaseCommand):
+    help = "Close a fiscal year: post its closing entries into Equity and store the next year's opening balances."
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int)
+        parser.add_argument(
+            '--equity-account', default=RETAINED_EARNINGS,
+            help=f"Equity account receiving the year's result (default: {RETAINED_EARNINGS}, created if missing).",
+        )
+
+    def handle(self, *args, **options):
+        account = Account.objects.filter(name__iexact=options['equity_account']).first()
+        if account is None and options['equity_account'] != RETAINED_EARNINGS:
+            raise CommandError(f"Unknown account: {options['equity_account']!r}")
+        try:
+            fiscal_close = close_fiscal_year(options['year'], account)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        journal = fiscal_close.closing_journal
+        entries = f"closing journal #{journal.pk}" if journal else "no closing entries needed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed fiscal year {fiscal_close.year} into {fiscal_close.equity_account.name} ({entries})."
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounting.importer import BATCH_SIZE
+from accounting.synthetic import generate_ledger
+
+
+class Command(BaseCommand):
+    help = "Add a synthetic chart of accounts and balanced journals, e.g. for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000, help="Transaction lines to add")
+        parser.add_argument('--accounts', type=int, default=50, help="Size of the synthetic chart of accounts")
+        parser.add_argument('--lines-per-journal', type=int, default=3)
+        parser.add_argument('--years', type=int, default=5, help="Spread journal dates over this many years")
+        parser.add_argument('--draft-ratio', type=float, default=0.05, help="Share of journals left as Draft")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Journals per transaction")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = generate_ledger(
+            options['lines'], accounts=options['accounts'], lines_per_journal=options['lines_per_journal'],
+            years=options['years'], draft_ratio=options['draft_ratio'], seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - start
+        for error in report.errors:
+            self.stderr.write(f"journal {error['row']}: {error['message']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {report.journals} journals / {report.lines} lines in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,44 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.importer import BATCH_SIZE, import_journals
+
+
+class Command(BaseCommand):
+    help = "Bulk import journals from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Journals per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, insert nothing")
+        parser.add_argument('--errors', help="Write the per-row error report to this CSV file")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        start = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                report = import_journals(stream, fmt, options['batch_size'], options['dry_run'])
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['row', 'message'])
+                writer.writerows((error['row'], error['message']) for error in report.errors)
+        else:
+            for error in report.errors:
+                self.stderr.write(f"row {error['row']}: {error['message']}")
+
+        verb = "Validated" if options['dry_run'] else "Imported"
+        rate = report.lines / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report.journals} journals / {report.lines} lines in {elapsed:.2f}s "
+            f"({rate:,.0f} lines/s); {len(report.errors)} rejected."
+        ))
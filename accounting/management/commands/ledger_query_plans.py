@@ -0,0 +1,112 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from accounting.models import Journal, Transaction
+
+# Added with posted_date (and the journal list's keyset index); dropped for the baseline run
+LEDGER_INDEXES = [index.name for model in (Journal, Transaction) for index in model._meta.indexes]
+
+
+class Command(BaseCommand):
+    help = (
+        "Print query plans and timings for the ledger's hot queries, comparing the "
+        "journal-join form without the ledger indexes (the baseline) with the indexed "
+        "posted_date form. The baseline drops those indexes inside a transaction that is "
+        "rolled back, which blocks writes to the tables meanwhile: run it on a copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, help="Account id (default: the account with most lines)")
+        parser.add_argument('--date', type=date.fromisoformat, default=date.today(), help="As-of date, YYYY-MM-DD")
+        parser.add_argument('--year', type=int, help="Dashboard year (default: year of --date)")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query; the best is reported")
+        parser.add_argument('--no-explain', action='store_true', help="Only print timings")
+
+    def handle(self, *args, **options):
+        account_id = options['account'] or self.busiest_account()
+        as_of = options['date']
+        year = options['year'] or as_of.year
+
+        lines = Transaction.objects.filter(account_id=account_id)
+        monthly = Transaction.objects.filter(account__account_type='Revenue')
+        cases = [
+            (
+                "Account balance as of date",
+                lines.filter(journal__status='Posted', journal__date__lte=as_of)
+                .values('account').annotate(Sum('debit'), Sum('credit')),
+                lines.filter(posted_date__lte=as_of)
+                .values('account').annotate(Sum('debit'), Sum('credit')),
+            ),
+            (
+                "Ledger lines in date order",
+                lines.filter(journal__status='Posted').order_by('journal__date', 'id'),
+                lines.filter(posted_date__isnull=False).order_by('posted_date', 'id'),
+            ),
+            (
+                "Dashboard monthly revenue",
+                monthly.filter(journal__status='Posted', journal__date__year=year)
+                .annotate(month_num=TruncMonth('journal__date')).values('month_num').annotate(total=Sum('credit')),
+                monthly.filter(posted_date__year=year)
+                .annotate(month_num=TruncMonth('posted_date')).values('month_num').annotate(total=Sum('credit')),
+            ),
+            (
+                "Available years",
+                Transaction.objects.filter(journal__status='Posted').dates('journal__date', 'year'),
+                Transaction.objects.filter(posted_date__isnull=False).dates('posted_date', 'year'),
+            ),
+        ]
+
+        self.stdout.write(f"Transactions: {Transaction.objects.count():,}  account={account_id}  date={as_of}  year={year}")
+        explain = not options['no_explain']
+        if connection.features.can_rollback_ddl:
+            before_label = "journal join, ledger indexes dropped"
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in LEDGER_INDEXES:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+                baseline = [self.measure(before, options['repeat'], explain) for title, before, after in cases]
+                transaction.set_rollback(True)
+        else:
+            # e.g. MySQL, where DROP INDEX commits: the plans below still use the ledger indexes
+            before_label = "journal join, ledger indexes present (not a baseline)"
+            self.stderr.write(self.style.WARNING(
+                f"{connection.vendor} cannot roll back DROP INDEX; the journal-join plans are not a baseline."
+            ))
+            baseline = [self.measure(before, options['repeat'], explain) for title, before, after in cases]
+
+        for (title, before, after), before_result in zip(cases, baseline):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {title}"))
+            for label, (elapsed, plan) in (
+                (before_label, before_result), ("posted_date", self.measure(after, options['repeat'], explain)),
+            ):
+                self.stdout.write(f"-- {label}: {elapsed * 1000:.1f} ms")
+                if plan:
+                    self.stdout.write(plan)
+
+    def measure(self, queryset, repeat, explain):
+        """(best time, plan or None) of `queryset`."""
+        return self.time_query(queryset, repeat), queryset.explain() if explain else None
+
+    def busiest_account(self):
+        row = (
+            Transaction.objects.values('account').annotate(lines=Count('id'))
+            .order_by('-lines').first()
+        )
+        if row is None:
+            raise CommandError("The ledger is empty; generate or import some journals first.")
+        return row['account']
+
+    def time_query(self, queryset, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            for _row in queryset.all().iterator():
+                pass
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounting.ledger import rebuild_period_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly AccountPeriodBalance snapshots from Posted transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_period_balances(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} account-period balance rows."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounting.models import Journal
+from accounting.search import index_journals
+
+
+class Command(BaseCommand):
+    help = "Rebuild the journal search tokens from descriptions and line account names."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch, total = [], 0
+        for pk in Journal.objects.values_list('pk', flat=True).iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) == batch_size:
+                index_journals(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            index_journals(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} journals."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.ledger import check_account_totals, fix_account_totals
+
+
+class Command(BaseCommand):
+    help = "Compare Account debit/credit totals with raw Posted Transaction sums and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report drift, exit non-zero if any.")
+
+    def handle(self, *args, **options):
+        mismatches = check_account_totals()
+        for account_id, expected, stored in mismatches:
+            self.stdout.write(
+                f"account={account_id} expected Dr:{expected[0]} Cr:{expected[1]} stored Dr:{stored[0]} Cr:{stored[1]}"
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Account totals are consistent."))
+            return
+        if options['check']:
+            raise CommandError(f"{len(mismatches)} accounts out of sync; run reconcile_account_totals to fix.")
+        count = fix_account_totals([account_id for account_id, expected, stored in mismatches])
+        self.stdout.write(self.style.SUCCESS(f"Fixed the totals of {count} accounts."))
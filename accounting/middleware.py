@@ -0,0 +1,96 @@
+"""
+Per-request SQL and timing instrumentation.
+
+For a sampled share of requests (settings.REQUEST_PROFILING_SAMPLE_RATE),
+RequestProfilingMiddleware wraps every database connection with an
+execute wrapper, so it works with DEBUG off, and records the view name,
+wall time, query count, total SQL time and the time spent waiting for a
+pooled connection (see accounting.db.pool). It also flags any statement run
+more than REQUEST_PROFILING_REPEAT_THRESHOLD times, which usually means an
+N+1 loop. The figures go out as a Server-Timing header and as one JSON
+line on the 'accounting.profiling' logger.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('accounting.profiling')
+
+DEFAULT_SAMPLE_RATE = 0.0
+DEFAULT_REPEAT_THRESHOLD = 5
+
+
+class QueryRecorder:
+    """Execute wrapper counting and timing statements, keyed by their SQL with placeholders."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self, threshold):
+        """[(sql, times), ...] for statements run more than `threshold` times, most frequent first."""
+        return [(sql, times) for sql, times in self.statements.most_common() if times > threshold]
+
+
+def _connection_wait():
+    return sum(getattr(connection, 'connection_wait', 0.0) for connection in connections.all())
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        waited = _connection_wait()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        sql_ms = recorder.duration * 1000
+        pool_ms = (_connection_wait() - waited) * 1000
+
+        threshold = getattr(settings, 'REQUEST_PROFILING_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+        repeated = recorder.repeated(threshold)
+        match = request.resolver_match
+        view = match.view_name if match else None
+
+        response['Server-Timing'] = (
+            f'total;dur={total_ms:.1f}, db;dur={sql_ms:.1f};desc="{recorder.count} queries", '
+            f'db-pool;dur={pool_ms:.1f}'
+        )
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'sql_ms': round(sql_ms, 1),
+            'queries': recorder.count,
+            'pool_wait_ms': round(pool_ms, 1),
+            'repeated': [{'sql': sql, 'times': times} for sql, times in repeated],
+        }
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(record))
+        return response
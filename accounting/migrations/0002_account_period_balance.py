@@ -0,0 +1,49 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_period_balances(apps, schema_editor):
+    Transaction = apps.get_model('accounting', 'Transaction')
+    AccountPeriodBalance = apps.get_model('accounting', 'AccountPeriodBalance')
+    rows = Transaction.objects.filter(journal__status='Posted').annotate(
+        period=TruncMonth('journal__date')
+    ).order_by().values('account_id', 'period').annotate(debit_sum=Sum('debit'), credit_sum=Sum('credit'))
+    AccountPeriodBalance.objects.bulk_create(
+        (
+            AccountPeriodBalance(
+                account_id=row['account_id'], period=row['period'],
+                debit=row['debit_sum'] or 0, credit=row['credit_sum'] or 0,
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPeriodBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_balances', to='accounting.account')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='accountperiodbalance',
+            constraint=models.UniqueConstraint(fields=('account', 'period'), name='unique_account_period'),
+        ),
+        migrations.RunPython(populate_period_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:32
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_posted_date(apps, schema_editor):
+    Journal = apps.get_model('accounting', 'Journal')
+    Transaction = apps.get_model('accounting', 'Transaction')
+    Transaction.objects.filter(journal__status='Posted').update(
+        posted_date=Subquery(Journal.objects.filter(pk=OuterRef('journal_id')).values('date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_account_period_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='posted_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_posted_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='journal',
+            index=models.Index(fields=['status', 'date'], name='journal_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'journal'], name='tx_account_journal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'posted_date'], name='tx_account_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['posted_date', 'account'], name='tx_posted_account_idx'),
+        ),
+    ]
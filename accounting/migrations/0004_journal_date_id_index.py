@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_ledger_indexes_posted_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journal',
+            index=models.Index(fields=['date', 'id'], name='journal_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:35
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# A frozen copy of accounting.search.journal_tokens() as it stood when this
+# migration was written, so later changes to the app's tokenizer cannot change it
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    tokens = []
+    for word in _WORD.findall((text or '').lower()):
+        word = word[:32]
+        if word not in tokens:
+            tokens.append(word)
+    return tokens
+
+
+def journal_tokens(description, account_names):
+    weights = {}
+    for token in tokenize(description):
+        weights[token] = weights.get(token, 0) + 3
+    for token in tokenize(' '.join(account_names)):
+        weights[token] = weights.get(token, 0) + 1
+    return weights
+
+
+def populate_search_tokens(apps, schema_editor):
+    Journal = apps.get_model('accounting', 'Journal')
+    Transaction = apps.get_model('accounting', 'Transaction')
+    JournalSearchToken = apps.get_model('accounting', 'JournalSearchToken')
+    account_names = {}
+    lines = Transaction.objects.values_list('journal_id', 'account__name').distinct()
+    for journal_id, name in lines.iterator():
+        account_names.setdefault(journal_id, []).append(name)
+    JournalSearchToken.objects.bulk_create(
+        (
+            JournalSearchToken(journal_id=journal_id, token=token, weight=weight)
+            for journal_id, description in Journal.objects.values_list('pk', 'description').iterator()
+            for token, weight in journal_tokens(description, account_names.get(journal_id, [])).items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_journal_date_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('journal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='accounting.journal')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'journal'], name='search_token_journal_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
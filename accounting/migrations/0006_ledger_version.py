@@ -0,0 +1,26 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:46
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    LedgerVersion = apps.get_model('accounting', 'LedgerVersion')
+    LedgerVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_journal_search_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.26 on 2026-10-17 18:09
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_totals(apps, schema_editor):
+    Account = apps.get_model('accounting', 'Account')
+    Transaction = apps.get_model('accounting', 'Transaction')
+    totals = Transaction.objects.filter(journal__status='Posted').order_by().values('account_id').annotate(
+        debit_sum=Sum('debit'), credit_sum=Sum('credit')
+    )
+    for row in totals:
+        Account.objects.filter(pk=row['account_id']).update(
+            debit_total=row['debit_sum'] or 0, credit_total=row['credit_sum'] or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0006_ledger_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='credit_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='debit_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
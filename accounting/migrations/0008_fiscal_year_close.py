@@ -0,0 +1,38 @@
+# Generated by Django 4.2.26 on 2026-10-17 18:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0007_account_ledger_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_balances', to='accounting.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FiscalYearClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(unique=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closing_journal', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='fiscal_close', to='accounting.journal')),
+                ('equity_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.account')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='openingbalance',
+            constraint=models.UniqueConstraint(fields=('account', 'year'), name='unique_account_opening_year'),
+        ),
+    ]
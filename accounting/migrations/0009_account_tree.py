@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-17 18:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Value
+from django.db.models.functions import Cast, LPad
+
+
+def fill_paths(apps, schema_editor):
+    # Every existing account is a root: its path is its own zero-padded id
+    Account = apps.get_model('accounting', 'Account')
+    Account.objects.update(path=LPad(Cast('pk', models.CharField()), 8, Value('0')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0008_fiscal_year_close'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Parent account of the same type; balances roll up to it', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='accounting.account'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,134 @@
-from django.db import models
-from django.db.models import Sum
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Func, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Concat, LPad, Substr, TruncMonth
+
+BALANCE_AMOUNT = models.DecimalField(max_digits=14, decimal_places=2)
+
+# An account's path is the zero-padded ids of its ancestors and itself, so
+# a subtree is the index range [path, path + PATH_END): every path in it
+# starts with `path`, and PATH_END sorts after every digit in any collation.
+PATH_DIGITS = 8
+PATH_END = 'z'
+
+
+def subtree(path, prefix=''):
+    """Q selecting the accounts whose path starts with `path` (a string or an expression)."""
+    if isinstance(path, str):
+        end = path + PATH_END
+    else:
+        end = Concat(path, Value(PATH_END), output_field=models.CharField())
+    return Q(**{f'{prefix}path__gte': path, f'{prefix}path__lt': end})
+
+
+def path_ids(path):
+    """The account ids in `path`, root first."""
+    return [int(path[i:i + PATH_DIGITS]) for i in range(0, len(path), PATH_DIGITS)]
+
+
+def balance_lines(date_from=None, date_to=None, status='Posted', prefix=''):
+    """
+    Q selecting the transaction lines counted in a balance over
+    [date_from, date_to] (either end may be None): lines of `status`
+    journals, or of every journal when status is None. Posted lines filter
+    on their posted_date copy, so they need no join to Journal. `prefix`
+    is the path to Transaction from the queried model ('transaction__'
+    from Account).
+    """
+    date_field = 'posted_date' if status == 'Posted' else 'journal__date'
+    lines = Q()
+    if status == 'Posted':
+        lines &= Q(**{f'{prefix}posted_date__isnull': False})
+    elif status:
+        lines &= Q(**{f'{prefix}journal__status': status})
+    if date_from:
+        lines &= Q(**{f'{prefix}{date_field}__gte': date_from})
+    if date_to:
+        lines &= Q(**{f'{prefix}{date_field}__lte': date_to})
+    return lines
+
+
+class AccountQuerySet(models.QuerySet):
+    def with_balances(self, date_from=None, date_to=None, status='Posted'):
+        """
+        Annotate debit_sum and credit_sum (zero when there are no lines)
+        over balance_lines(date_from, date_to, status), in the same query as
+        the accounts themselves.
+        """
+        lines = balance_lines(date_from, date_to, status, prefix='transaction__') or None
+        zero = Value(Decimal('0'))
+        return self.annotate(
+            debit_sum=Coalesce(Sum('transaction__debit', filter=lines), zero, output_field=BALANCE_AMOUNT),
+            credit_sum=Coalesce(Sum('transaction__credit', filter=lines), zero, output_field=BALANCE_AMOUNT),
+        )
+
+
+    def with_period_balances(self, periods, cumulative=False, exclude_closing=False):
+        """
+        Annotate debit_<i> and credit_<i> for the i-th (date_from, date_to)
+        of `periods`: Posted lines in that range, or every Posted line up to
+        date_to when `cumulative`. The columns are conditional sums over a
+        single pass of the lines, so the query count does not grow with the
+        number of periods. `exclude_closing` leaves out fiscal-year closing
+        journals.
+        """
+        base = Q(transaction__journal__fiscal_close__isnull=True) if exclude_closing else Q()
+        zero = Value(Decimal('0'))
+        columns = {}
+        for i, (date_from, date_to) in enumerate(periods):
+            lines = base & balance_lines(None if cumulative else date_from, date_to, prefix='transaction__')
+            columns[f'debit_{i}'] = Coalesce(Sum('transaction__debit', filter=lines), zero, output_field=BALANCE_AMOUNT)
+            columns[f'credit_{i}'] = Coalesce(Sum('transaction__credit', filter=lines), zero, output_field=BALANCE_AMOUNT)
+        return self.annotate(**columns)
+
+    def with_subtree_totals(self):
+        """
+        Annotate subtree_debit and subtree_credit: the stored Posted totals
+        of each account and all its descendants, summed over the path range
+        of the account's subtree in the same query.
+        """
+        zero = Value(Decimal('0'))
+        totals = {}
+        for side in ('debit', 'credit'):
+            # A plain SUM() over the subtree rows, with no GROUP BY
+            subtree_sum = Account.objects.filter(subtree(OuterRef('path'))).order_by().annotate(
+                total=Func(f'{side}_total', function='SUM')
+            ).values('total')
+            totals[f'subtree_{side}'] = Coalesce(Subquery(subtree_sum), zero, output_field=BALANCE_AMOUNT)
+        return self.annotate(**totals)
+
+
+class TransactionQuerySet(models.QuerySet):
+    BALANCE_GROUPS = ('account', 'account_type', 'month')
+
+    def balances(self, date_from=None, date_to=None, status='Posted', group_by=('account',)):
+        """
+        Debit/credit totals of balance_lines(date_from, date_to, status) in
+        one grouped query: dicts of the `group_by` keys ('account',
+        'account_type' and/or 'month', the first day of the journal's
+        month) plus debit_sum and credit_sum, ordered by those keys.
+        """
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        keys = {}
+        for group in group_by:
+            if group == 'account':
+                keys['account'] = 'account'
+            elif group == 'account_type':
+                keys['account_type'] = models.F('account__account_type')
+            elif group == 'month':
+                keys['month'] = TruncMonth('posted_date' if status == 'Posted' else 'journal__date')
+            else:
+                raise ValueError(f"Cannot group balances by {group!r}; use one of {self.BALANCE_GROUPS}.")
+        fields = [key for key, value in keys.items() if isinstance(value, str)]
+        expressions = {key: value for key, value in keys.items() if not isinstance(value, str)}
+        return self.filter(balance_lines(date_from, date_to, status)).values(*fields, **expressions).annotate(
+            debit_sum=Sum('debit'), credit_sum=Sum('credit'),
+        ).order_by(*keys)
+
 
 # -------------------------------------------
 # 1. Chart of Accounts Model
@@ -16,27 +145,131 @@ class Account(models.Model):
     
     name = models.CharField(max_length=100, unique=True)
     account_type = models.CharField(max_length=10, choices=ACCOUNT_TYPES)
+    parent = models.ForeignKey(
+        'self', related_name='children', on_delete=models.PROTECT, null=True, blank=True,
+        help_text="Parent account of the same type; balances roll up to it",
+    )
+    # Materialized path (see PATH_DIGITS), maintained by save()
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    # Posted totals over all dates, kept up to date by accounting.ledger with
+    # F() updates in the same transaction as every posting change.
+    debit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    credit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    objects = AccountQuerySet.as_manager()
+
+    LEDGER_TOTAL_FIELDS = ('debit_total', 'credit_total')
+    NAMES_CACHE_KEY = 'accounting:account_names'
+    NAMES_CACHE_TIMEOUT = 60  # seconds; bounds how long other workers' caches lag an account change
 
     def __str__(self):
         return self.name
 
-    def get_balance(self, filter_date=None):
-        
-        tx_filter = {'journal__status': 'Posted'}
-        
-      
-        if filter_date:
-            tx_filter['journal__date__lte'] = filter_date
-
-        
-        debit_sum = self.transaction_set.filter(**tx_filter).aggregate(Sum('debit'))['debit__sum'] or 0
-        credit_sum = self.transaction_set.filter(**tx_filter).aggregate(Sum('credit'))['credit__sum'] or 0
-        
-      
-        if self.account_type in ['Asset', 'Expense']:
-            return debit_sum - credit_sum
+    @classmethod
+    def names(cls):
+        """
+        {pk: name} of the whole chart in name order, served from the cache once
+        warm. accounting.signals drops the cached copy whenever an account is
+        saved or deleted; code that bulk-creates accounts calls clear_names().
+        That only reaches this process's cache, so the copy also expires after
+        NAMES_CACHE_TIMEOUT and may lack an account another worker just added.
+        """
+        names = cache.get(cls.NAMES_CACHE_KEY)
+        if names is None:
+            names = dict(cls.objects.order_by('name').values_list('pk', 'name'))
+            cache.set(cls.NAMES_CACHE_KEY, names, cls.NAMES_CACHE_TIMEOUT)
+        return names
+
+    @classmethod
+    def clear_names(cls):
+        cache.delete(cls.NAMES_CACHE_KEY)
+
+    @classmethod
+    def fill_paths(cls):
+        """Give bulk-created root accounts (which skip save()) their path, in one UPDATE."""
+        cls.objects.filter(path='', parent__isnull=True).update(
+            path=LPad(Cast('pk', models.CharField()), PATH_DIGITS, Value('0'))
+        )
+
+    @property
+    def depth(self):
+        return max(len(self.path) // PATH_DIGITS - 1, 0)
+
+    def clean(self):
+        # Sub-accounts roll up into their parent, which signs them by its own type
+        if self.pk and Account.objects.filter(parent=self).exclude(account_type=self.account_type).exists():
+            raise ValidationError({
+                'account_type': f"{self.name} has sub-accounts of another type; move them before changing its type.",
+            })
+        if self.parent is None:
+            return
+        if self.parent.account_type != self.account_type:
+            raise ValidationError({'parent': f"{self.parent.name} is not a {self.account_type} account."})
+        if self.pk and self.path and self.parent.path.startswith(self.path):
+            raise ValidationError({'parent': "An account cannot be placed under itself or its own sub-accounts."})
+
+    def save(self, *args, **kwargs):
+        # A full save of an instance loaded earlier must not write its stale
+        # totals over postings made since, nor a stale path.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.LEDGER_TOTAL_FIELDS + ('path',)
+            ]
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            self.place_in_tree()
+
+    def place_in_tree(self):
+        """Point the path under the parent's stored path, moving the whole subtree along when it changed."""
+        stored = dict(Account.objects.filter(pk__in=[self.pk, self.parent_id]).values_list('pk', 'path'))
+        path = stored.get(self.parent_id, '') + f'{self.pk:0{PATH_DIGITS}d}'
+        old = stored[self.pk]
+        if path != old:
+            if old:
+                Account.objects.filter(subtree(old)).update(path=Concat(Value(path), Substr('path', len(old) + 1)))
+            else:
+                Account.objects.filter(pk=self.pk).update(path=path)
+        self.path = path
+
+    def get_subtree_balance(self, filter_date=None):
+        """Signed Posted balance of this account and all its sub-accounts, as of `filter_date`, in one query."""
+        if not filter_date:
+            totals = Account.objects.filter(subtree(self.path)).aggregate(
+                debit_sum=Sum('debit_total'), credit_sum=Sum('credit_total'),
+            )
         else:
-            return credit_sum - debit_sum
+            totals = Transaction.objects.filter(
+                subtree(self.path, prefix='account__'), balance_lines(date_to=filter_date),
+            ).aggregate(debit_sum=Sum('debit'), credit_sum=Sum('credit'))
+        return signed_balance(self.account_type, totals['debit_sum'] or 0, totals['credit_sum'] or 0)
+
+    def get_balance(self, filter_date=None, date_from=None, status='Posted'):
+        """
+        Signed balance over [date_from, filter_date] of `status` journals
+        (every journal when None); see AccountQuerySet.with_balances().
+        """
+        if not filter_date and not date_from and status == 'Posted':
+            # Re-read the totals: this instance may predate later postings
+            self.debit_total, self.credit_total = Account.objects.filter(pk=self.pk).values_list(
+                'debit_total', 'credit_total'
+            ).get()
+            return signed_balance(self.account_type, self.debit_total, self.credit_total)
+
+        debit_sum, credit_sum = Account.objects.filter(pk=self.pk).with_balances(
+            date_from, filter_date, status
+        ).values_list('debit_sum', 'credit_sum').get()
+        return signed_balance(self.account_type, debit_sum, credit_sum)
+
+
+DEBIT_NORMAL_TYPES = ('Asset', 'Expense')
+
+
+def signed_balance(account_type, debit, credit):
+    """Apply the normal-balance rule: Asset/Expense are debit-normal, the rest credit-normal."""
+    if account_type in DEBIT_NORMAL_TYPES:
+        return debit - credit
+    return credit - debit
 
 
 # -------------------------------------------
@@ -52,9 +285,26 @@ class Journal(models.Model):
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Posted')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date'], name='journal_status_date_idx'),
+            models.Index(fields=['date', 'id'], name='journal_date_id_idx'),
+        ]
+
     def __str__(self):
         return f"Journal #{self.id} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            # Date or status may have changed: refresh the lines' denormalized posted_date
+            self.transactions.update(posted_date=self.posted_date)
+
+    @property
+    def posted_date(self):
+        return self.date if self.status == 'Posted' else None
+
     def get_total_amount(self):
         return self.transactions.aggregate(total=models.Sum('debit'))['total'] or 0
 
@@ -67,10 +317,26 @@ class Transaction(models.Model):
     account = models.ForeignKey(Account, on_delete=models.PROTECT)
     debit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     credit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Copy of journal.date while the journal is Posted (NULL for drafts), so
+    # balance/ledger aggregations are index range scans without a join.
+    posted_date = models.DateField(null=True, blank=True, editable=False)
+
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'journal'], name='tx_account_journal_idx'),
+            models.Index(fields=['account', 'posted_date'], name='tx_account_posted_idx'),
+            models.Index(fields=['posted_date', 'account'], name='tx_posted_account_idx'),
+        ]
 
     def __str__(self):
         return f"{self.account.name} - Dr:{self.debit} Cr:{self.credit}"
 
+    def save(self, *args, **kwargs):
+        self.posted_date = self.journal.posted_date
+        super().save(*args, **kwargs)
+
 
 # -------------------------------------------
 # 4. Company Settings (Branding)
@@ -81,9 +347,126 @@ class CompanySettings(models.Model):
     logo = models.ImageField(upload_to='company_logos/', blank=True, null=True)
     currency_symbol = models.CharField(max_length=10, default="৳") 
     
+    CACHE_KEY = 'accounting:company_settings'
+    CACHE_TIMEOUT = 60  # seconds; bounds how long other workers' caches lag an edit
+
     class Meta:
         verbose_name = "Company Settings"
         verbose_name_plural = "Company Settings"
 
     def __str__(self):
-        return self.company_name
\ No newline at end of file
+        return self.company_name
+
+    @classmethod
+    def current(cls):
+        """
+        The branding row (or None), served from the cache once warm.
+        accounting.signals drops the cached copy whenever the row is saved or deleted;
+        other workers' copies expire after CACHE_TIMEOUT.
+        """
+        cached = cache.get(cls.CACHE_KEY)
+        if cached is None:
+            cached = {'settings': cls.objects.first()}
+            cache.set(cls.CACHE_KEY, cached, cls.CACHE_TIMEOUT)
+        return cached['settings']
+
+
+# -------------------------------------------
+# 5. Account Period Balance (Monthly Snapshot)
+# -------------------------------------------
+class AccountPeriodBalance(models.Model):
+    """
+    Posted debit/credit totals of one account for one calendar month.
+    Maintained incrementally by accounting.ledger so as-of reports can sum
+    a few snapshot rows instead of re-scanning every transaction.
+    """
+    account = models.ForeignKey(Account, related_name='period_balances', on_delete=models.CASCADE)
+    period = models.DateField(help_text="First day of the month")
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period'], name='unique_account_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.account.name} {self.period:%Y-%m} - Dr:{self.debit} Cr:{self.credit}"
+
+
+# -------------------------------------------
+# 6. Journal Search Index
+# -------------------------------------------
+class JournalSearchToken(models.Model):
+    """
+    One lower-cased word from a journal's description or from the account
+    names on its lines. Maintained by accounting.search so lookups are
+    prefix range scans on (token, journal) instead of '%term%' LIKE scans.
+    """
+    journal = models.ForeignKey(Journal, related_name='search_tokens', on_delete=models.CASCADE)
+    token = models.CharField(max_length=32)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'journal'], name='search_token_journal_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> Journal #{self.journal_id}"
+
+
+# -------------------------------------------
+# 7. Ledger Version
+# -------------------------------------------
+class LedgerVersion(models.Model):
+    """
+    Single-row counter that accounting.ledger bumps in the same transaction
+    as every change to posted balances or the chart of accounts, so cached
+    report results can be keyed by it and never outlive the data.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Ledger version {self.version}"
+
+
+# -------------------------------------------
+# 8. Fiscal Year Close
+# -------------------------------------------
+class FiscalYearClose(models.Model):
+    """
+    A closed (calendar) fiscal year. Closing posts `closing_journal`, which
+    moves every Revenue and Expense balance into `equity_account`, and
+    stores the OpeningBalance rows of the next year (see accounting.closing).
+    Journals dated in a closed year, or any earlier one, are locked.
+    """
+    year = models.PositiveSmallIntegerField(unique=True)
+    closing_journal = models.OneToOneField(
+        Journal, related_name='fiscal_close', on_delete=models.PROTECT, null=True, blank=True,
+    )
+    equity_account = models.ForeignKey(Account, related_name='+', on_delete=models.PROTECT)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Fiscal year {self.year} (closed)"
+
+
+class OpeningBalance(models.Model):
+    """
+    Posted debit/credit totals of one account before 1 January of `year`,
+    closing entries included. Written when the previous year is closed, so
+    as-of reports sum one row per account plus that year's snapshots.
+    """
+    account = models.ForeignKey(Account, related_name='opening_balances', on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'year'], name='unique_account_opening_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.account.name} opening {self.year} - Dr:{self.debit} Cr:{self.credit}"
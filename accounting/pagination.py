@@ -0,0 +1,85 @@
+"""
+Keyset (seek) pagination.
+
+Pages are addressed by the (date, id) of their first/last row rather than
+by OFFSET, so page 1,000 costs the same index range scan as page 1.
+"""
+from datetime import date
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(day, pk):
+    return f"{day.isoformat()}_{pk}"
+
+
+def decode_cursor(value):
+    """Parse a 'YYYY-MM-DD_id' cursor; returns None for a missing or malformed one."""
+    try:
+        day, pk = value.split('_')
+        return date.fromisoformat(day), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def keyset_paginate(queryset, keys, after=None, before=None, per_page=PAGE_SIZE, descending=False):
+    """
+    Return the KeysetPage of `queryset` that follows cursor `after` (or
+    precedes cursor `before`) in (date, id) order given by `keys`.
+    """
+    date_key, id_key = keys
+    after, before = decode_cursor(after), decode_cursor(before)
+    forward = before is None
+    cursor = after if forward else before
+
+    # Forward through a descending list (or backward through an ascending
+    # one) means seeking to smaller keys.
+    seek_down = descending == forward
+    if cursor:
+        op = 'lt' if seek_down else 'gt'
+        day, pk = cursor
+        queryset = queryset.filter(
+            Q(**{f'{date_key}__{op}': day}) | Q(**{date_key: day, f'{id_key}__{op}': pk})
+        )
+    order = (f'-{date_key}', f'-{id_key}') if seek_down else (date_key, id_key)
+    items = list(queryset.order_by(*order)[:per_page + 1])
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if not forward:
+        items.reverse()
+    if not items:
+        return KeysetPage(items)
+
+    def cursor_of(item):
+        return encode_cursor(getattr(item, date_key), getattr(item, id_key))
+
+    if forward:
+        next_cursor = cursor_of(items[-1]) if has_more else None
+        previous_cursor = cursor_of(items[0]) if cursor else None
+    else:
+        next_cursor = cursor_of(items[-1])
+        previous_cursor = cursor_of(items[0]) if has_more else None
+    return KeysetPage(items, next_cursor, previous_cursor)
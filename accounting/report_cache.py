@@ -0,0 +1,85 @@
+"""
+Versioned report cache.
+
+Computed report rows are kept in a per-process LRU keyed by
+(report, as-of, ledger version). The ledger version is read from the
+database on every lookup and is bumped in the same transaction as every
+ledger change (see accounting.ledger), so a cached entry can only be
+returned while the data it was computed from is still current.
+"""
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+
+from .ledger import ledger_version
+
+REPORT_CACHE_SIZE = 128
+
+
+class ReportCache:
+    def __init__(self, max_entries=REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, report, as_of, compute):
+        """Return the cached result of `report` as of `as_of`, calling compute() on a miss."""
+        version = ledger_version()
+        key = (report, as_of, version)
+        hit, result = self._lookup(key, version)
+        if not hit:
+            result = compute()
+            self._store(key, version, result)
+        return result
+
+    async def aget(self, report, as_of, compute):
+        """get() for async views: `compute` is a coroutine function."""
+        version = await sync_to_async(ledger_version)()
+        key = (report, as_of, version)
+        hit, result = self._lookup(key, version)
+        if not hit:
+            result = await compute()
+            self._store(key, version, result)
+        return result
+
+    def _lookup(self, key, version):
+        with self._lock:
+            if self._version is None or version > self._version:
+                # Entries of older versions can never be hit again
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def _store(self, key, version, result):
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'version': self._version,
+        }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,114 @@
+"""
+Read-replica routing for report pages.
+
+Views decorated with @replica_reads send their reads to the database
+alias named by settings.REPORT_REPLICA_ALIAS, when that alias is
+configured. Everything else, including every write, uses "default".
+Reads stay on the primary when:
+
+* the request has already written something (the router sees every
+  write through db_for_write), or
+* the session wrote something within the last REPORT_REPLICA_PIN_SECONDS,
+  so a user who just posted a journal sees it despite replication lag.
+  ReplicaPinMiddleware records that time in the session.
+
+The flag is a context variable, so it also reaches the worker threads an
+async view hands its queries to (sync_to_async copies the context).
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_SESSION_KEY = '_primary_until'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def replica_alias():
+    """The configured replica alias, or None when reports should read from the primary."""
+    alias = getattr(settings, 'REPORT_REPLICA_ALIAS', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+@contextmanager
+def reading_from_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def tracking_writes():
+    """One request's scope for write tracking; yields a callable telling whether anything was written."""
+    token = _wrote.set(False)
+    try:
+        yield _wrote.get
+    finally:
+        _wrote.reset(token)
+
+
+def _pinned_to_primary(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def replica_reads(view):
+    """Run `view` with its reads routed to the replica, unless the session is pinned to the primary."""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # Loading the session is a database read, which must not run on the event loop
+            if replica_alias() is None or await sync_to_async(_pinned_to_primary)(request):
+                return await view(request, *args, **kwargs)
+            with reading_from_replica():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if replica_alias() is None or _pinned_to_primary(request):
+            return view(request, *args, **kwargs)
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReportReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not _wrote.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Pin the session to the primary for a while after any request that wrote. Goes after SessionMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with tracking_writes() as wrote:
+            response = self.get_response(request)
+            if wrote() and replica_alias() is not None and hasattr(request, 'session'):
+                pin_seconds = getattr(settings, 'REPORT_REPLICA_PIN_SECONDS', 10)
+                request.session[PIN_SESSION_KEY] = time.time() + pin_seconds
+        return response
@@ -0,0 +1,116 @@
+"""
+Journal search index.
+
+Journal descriptions and the account names on each journal's lines are
+split into tokens stored in JournalSearchToken. Searches match every query
+term by prefix against the (token, journal) index and rank journals by the
+summed token weights, so no query needs a leading-wildcard LIKE scan.
+
+Terms therefore match the start of a word only: "cash" finds "Cash" and
+"Cashier", but "ash" finds neither.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+
+from .models import Journal, JournalSearchToken, Transaction
+
+SEARCH_LIMIT = 200
+TOKEN_LENGTH = 32
+DESCRIPTION_WEIGHT = 3
+ACCOUNT_WEIGHT = 1
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Unique lower-cased words of `text` in order of appearance."""
+    tokens = []
+    for word in _WORD.findall((text or '').lower()):
+        word = word[:TOKEN_LENGTH]
+        if word not in tokens:
+            tokens.append(word)
+    return tokens
+
+
+def journal_tokens(description, account_names):
+    """Map token -> weight for one journal."""
+    weights = {}
+    for token in tokenize(description):
+        weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+    for token in tokenize(' '.join(account_names)):
+        weights[token] = weights.get(token, 0) + ACCOUNT_WEIGHT
+    return weights
+
+
+def index_journals(journal_ids, batch_size=1000):
+    """(Re)build the search tokens of the given journals."""
+    journal_ids = list(journal_ids)
+    descriptions = dict(Journal.objects.filter(pk__in=journal_ids).values_list('pk', 'description'))
+    account_names = {}
+    lines = Transaction.objects.filter(journal_id__in=journal_ids).values_list(
+        'journal_id', 'account__name'
+    ).distinct()
+    for journal_id, name in lines:
+        account_names.setdefault(journal_id, []).append(name)
+
+    JournalSearchToken.objects.filter(journal_id__in=journal_ids).delete()
+    JournalSearchToken.objects.bulk_create(
+        (
+            JournalSearchToken(journal_id=journal_id, token=token, weight=weight)
+            for journal_id, description in descriptions.items()
+            for token, weight in journal_tokens(description, account_names.get(journal_id, [])).items()
+        ),
+        batch_size=batch_size,
+    )
+
+
+def reindex_account(account_id, batch_size=500):
+    """Refresh every journal with a line on `account_id`, e.g. after the account is renamed."""
+    journal_ids = list(
+        Transaction.objects.filter(account_id=account_id).values_list('journal_id', flat=True).distinct()
+    )
+    for start in range(0, len(journal_ids), batch_size):
+        index_journals(journal_ids[start:start + batch_size])
+
+
+def _matches(terms, journals):
+    tokens = JournalSearchToken.objects.filter(
+        reduce(or_, (Q(token__istartswith=term) for term in terms))
+    )
+    if journals is not None:
+        tokens = tokens.filter(journal__in=journals.values('pk'))
+
+    term_hits = {
+        f'term_{i}': Max(Case(
+            When(token__istartswith=term, then=Value(1)), default=Value(0), output_field=IntegerField()
+        ))
+        for i, term in enumerate(terms)
+    }
+    return tokens.values('journal').annotate(rank=Sum('weight'), **term_hits).filter(
+        **{name: 1 for name in term_hits}
+    )
+
+
+def rank_journals(query, journals=None, limit=SEARCH_LIMIT, offset=0):
+    """
+    Return [(journal_id, rank), ...] for journals matching every term of
+    `query` by prefix, best match (then newest) first, `limit` of them from
+    position `offset`. `journals` may be a Journal queryset restricting the
+    candidates (e.g. a date filter).
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    matches = _matches(terms, journals)
+    return list(matches.order_by('-rank', '-journal').values_list('journal', 'rank')[offset:offset + limit])
+
+
+def matching_journals(query, journals=None):
+    """Unranked subquery of the ids of every journal matching `query`, for bulk use such as exports."""
+    terms = tokenize(query)
+    if not terms:
+        return Journal.objects.none().values('pk')
+    return _matches(terms, journals).order_by().values('journal')
@@ -0,0 +1,17 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Account, CompanySettings
+
+
+@receiver(post_save, sender=CompanySettings)
+@receiver(post_delete, sender=CompanySettings)
+def clear_company_settings_cache(sender, **kwargs):
+    cache.delete(CompanySettings.CACHE_KEY)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def clear_account_names_cache(sender, **kwargs):
+    Account.clear_names()
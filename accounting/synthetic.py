@@ -0,0 +1,109 @@
+"""
+Synthetic ledger generator for benchmarks.
+
+Builds a chart of accounts and balanced journals spread over several
+years with a Draft/Posted mix, and writes them through the bulk
+importer's insert path, so snapshots, search tokens and the ledger
+version are maintained exactly as for imported data.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from .importer import BATCH_SIZE, Importer, JournalRecord
+from .models import Account, Journal
+
+ACCOUNT_NAMES = {
+    'Asset': ['Cash', 'Bank', 'Accounts Receivable', 'Inventory', 'Equipment', 'Prepaid Rent'],
+    'Liability': ['Accounts Payable', 'Bank Loan', 'Accrued Wages', 'VAT Payable'],
+    'Equity': ['Capital', 'Retained Earnings'],
+    'Revenue': ['Sales', 'Service Income', 'Interest Income'],
+    'Expense': ['Rent', 'Salaries', 'Utilities', 'Office Supplies', 'Travel', 'Marketing', 'Repairs'],
+}
+DESCRIPTION_WORDS = [
+    'invoice', 'payment', 'receipt', 'refund', 'salary', 'rent', 'supplies', 'transfer',
+    'deposit', 'loan', 'repair', 'travel', 'utility', 'advance', 'purchase', 'sale',
+]
+CENT = Decimal('0.01')
+
+
+def synthetic_accounts(count):
+    """The first `count` synthetic (name, account_type) pairs, cycling through the types."""
+    types = list(ACCOUNT_NAMES)
+    accounts = []
+    for i in range(count):
+        account_type = types[i % len(types)]
+        names = ACCOUNT_NAMES[account_type]
+        series, base = divmod(i // len(types), len(names))
+        name = names[base] if series == 0 else f"{names[base]} {series + 1}"
+        accounts.append((name, account_type))
+    return accounts
+
+
+def ensure_accounts(count):
+    """Create whichever of the first `count` synthetic accounts are missing; returns their ids."""
+    wanted = synthetic_accounts(count)
+    existing = dict(Account.objects.filter(name__in=[name for name, t in wanted]).values_list('name', 'pk'))
+    Account.objects.bulk_create(
+        Account(name=name, account_type=account_type)
+        for name, account_type in wanted if name not in existing
+    )
+    # bulk_create skips save() and sends no post_save
+    Account.fill_paths()
+    Account.clear_names()
+    return list(Account.objects.filter(name__in=[name for name, t in wanted]).values_list('pk', flat=True))
+
+
+def _split(total_cents, parts, rng):
+    """Split a positive amount in cents into `parts` positive amounts."""
+    if parts == 1:
+        return [total_cents]
+    cuts = sorted(rng.sample(range(1, total_cents), parts - 1))
+    return [b - a for a, b in zip([0] + cuts, cuts + [total_cents])]
+
+
+def synthetic_journals(count, account_ids, lines_per_journal=3, years=5, draft_ratio=0.05, seed=0):
+    """Yield (JournalRecord, Journal, lines) tuples ready for Importer.flush()."""
+    rng = random.Random(seed)
+    lines_per_journal = max(lines_per_journal, 2)
+    debit_lines = lines_per_journal // 2
+    end = date.today()
+    start = date(end.year - years + 1, 1, 1)
+    span = (end - start).days
+
+    for i in range(count):
+        total = rng.randint(100 * lines_per_journal, 5_000_000)
+        debits = _split(total, debit_lines, rng)
+        credits = _split(total, lines_per_journal - debit_lines, rng)
+        if len(account_ids) >= lines_per_journal:
+            accounts = rng.sample(account_ids, lines_per_journal)
+        else:
+            accounts = [rng.choice(account_ids) for _ in range(lines_per_journal)]
+        lines = [(account_id, Decimal(cents) * CENT, Decimal('0')) for account_id, cents in zip(accounts, debits)]
+        lines += [
+            (account_id, Decimal('0'), Decimal(cents) * CENT)
+            for account_id, cents in zip(accounts[debit_lines:], credits)
+        ]
+        status = 'Draft' if rng.random() < draft_ratio else 'Posted'
+        description = f"{rng.choice(DESCRIPTION_WORDS).title()} {rng.choice(DESCRIPTION_WORDS)} #{i + 1}"
+        journal = Journal(date=start + timedelta(days=rng.randint(0, span)), description=description, status=status)
+        yield JournalRecord(i + 1, journal.date, description, status, lines), journal, lines
+
+
+def generate_ledger(lines, accounts=50, lines_per_journal=3, years=5, draft_ratio=0.05, seed=0,
+                    batch_size=BATCH_SIZE):
+    """Add roughly `lines` transaction lines of synthetic journals; returns the ImportReport."""
+    account_ids = ensure_accounts(accounts)
+    importer = Importer(batch_size=batch_size)
+    journals = synthetic_journals(
+        max(lines // max(lines_per_journal, 2), 1), account_ids, lines_per_journal, years, draft_ratio, seed,
+    )
+    batch = []
+    for item in journals:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            importer.flush(batch)
+            batch = []
+    if batch:
+        importer.flush(batch)
+    return importer.report
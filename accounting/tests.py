@@ -1,3 +1,1365 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+from functools import partial
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .admin import JournalAdmin
+from .balances import (
+    balances_as_of, comparative_balances, dashboard_figures, period_balances, period_buckets, subtree_balances,
+    total_balance,
+)
+from .db.mysql.base import DatabaseWrapper as PooledMySQLWrapper
+from .db.pool import ConnectionPool, close_pool
+from .db.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .benchmark import benchmark_views, find_regressions
+from .closing import close_fiscal_year
+from .concurrency import run_concurrently
+from .forms import TransactionFormSet
+from .importer import import_journals
+from .ledger import (
+    ClosedPeriodError, check_account_totals, check_period_balances, journal_postings, ledger_version,
+    rebuild_period_balances, record_posting_change,
+)
+from .models import (
+    Account, AccountPeriodBalance, CompanySettings, FiscalYearClose, Journal, OpeningBalance, Transaction,
+)
+from .pagination import keyset_paginate
+from .report_cache import ReportCache, report_cache
+from .routers import PIN_SESSION_KEY, ReportReplicaRouter, reading_from_replica, tracking_writes
+from .search import index_journals, rank_journals
+from .synthetic import generate_ledger
+
+
+def post_journal(lines, on=date(2025, 1, 15), status='Posted', description=''):
+    """Create a journal with (account, debit, credit) lines."""
+    journal = Journal.objects.create(date=on, status=status, description=description)
+    for account, debit, credit in lines:
+        Transaction.objects.create(journal=journal, account=account, debit=debit, credit=credit)
+    record_posting_change({}, journal_postings([journal.pk]))
+    index_journals([journal.pk])
+    return journal
+
+
+class LedgerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cash = Account.objects.create(name='Cash', account_type='Asset')
+        cls.loan = Account.objects.create(name='Bank Loan', account_type='Liability')
+        cls.capital = Account.objects.create(name='Capital', account_type='Equity')
+        cls.sales = Account.objects.create(name='Sales', account_type='Revenue')
+        cls.rent = Account.objects.create(name='Rent', account_type='Expense')
+
+        post_journal([(cls.cash, 1000, 0), (cls.capital, 0, 1000)], on=date(2024, 12, 1))
+        post_journal([(cls.cash, 500, 0), (cls.sales, 0, 500)], on=date(2025, 1, 10))
+        post_journal([(cls.rent, 200, 0), (cls.cash, 0, 200)], on=date(2025, 2, 5))
+        post_journal([(cls.cash, 300, 0), (cls.loan, 0, 300)], on=date(2025, 2, 20))
+        post_journal([(cls.rent, 999, 0), (cls.cash, 0, 999)], on=date(2025, 1, 20), status='Draft')
+
+    def setUp(self):
+        cache.clear()
+        report_cache.clear()
+
+    def journal_post_data(self, lines, on='2025-03-10', **extra):
+        data = {
+            'date': on, 'description': 'Test entry',
+            'transactions-TOTAL_FORMS': str(len(lines)), 'transactions-INITIAL_FORMS': '0',
+            'transactions-MIN_NUM_FORMS': '1', 'transactions-MAX_NUM_FORMS': '1000',
+        }
+        for i, (account, debit, credit) in enumerate(lines):
+            data[f'transactions-{i}-account'] = account.pk
+            data[f'transactions-{i}-debit'] = debit
+            data[f'transactions-{i}-credit'] = credit
+        data.update(extra)
+        return data
+
+
+class BalanceEngineTests(LedgerTestCase):
+    def test_matches_get_balance(self):
+        for as_of in (None, date(2024, 12, 31), date(2025, 1, 31), date(2025, 2, 28)):
+            rows = {row.id: row.balance for row in balances_as_of(as_of)}
+            for account in Account.objects.all():
+                self.assertEqual(rows[account.id], account.get_balance(as_of), (account, as_of))
+
+    def test_sign_rule_and_draft_exclusion(self):
+        rows = {row.name: row for row in balances_as_of()}
+        self.assertEqual(rows['Cash'].balance, Decimal('1600'))
+        self.assertEqual(rows['Rent'].balance, Decimal('200'))
+        self.assertEqual(rows['Sales'].balance, Decimal('500'))
+        self.assertEqual(rows['Bank Loan'].balance, Decimal('300'))
+
+    def test_account_type_filter(self):
+        rows = balances_as_of(account_types=['Revenue', 'Expense'])
+        self.assertEqual({row.name for row in rows}, {'Sales', 'Rent'})
+
+    def test_posted_date_follows_journal_status(self):
+        journal = post_journal([(self.cash, 10, 0), (self.sales, 0, 10)], on=date(2025, 3, 3))
+        self.assertEqual(set(journal.transactions.values_list('posted_date', flat=True)), {date(2025, 3, 3)})
+        journal.status = 'Draft'
+        journal.save()
+        self.assertEqual(set(journal.transactions.values_list('posted_date', flat=True)), {None})
+
+    def test_fixed_query_count(self):
+        for i in range(20):
+            Account.objects.create(name=f'Extra {i}', account_type='Asset')
+        # The last closed year, then the balances themselves
+        with self.assertNumQueries(2):
+            balances_as_of(date(2025, 1, 31))
+
+    def test_query_plans_baseline_runs_without_the_ledger_indexes(self):
+        out = io.StringIO()
+        call_command('ledger_query_plans', '--repeat', '1', '--date', '2025-03-01', stdout=out)
+        before, after = out.getvalue().split('== Account balance as of date')[1].split('-- posted_date')[:2]
+        self.assertIn('ledger indexes dropped', before)
+        self.assertNotIn('tx_', before)
+        self.assertIn('tx_account_posted_idx', after)
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Transaction._meta.db_table)
+        self.assertIn('tx_account_posted_idx', indexes)  # rolled back afterwards
+
+
+class BalanceQueryTests(LedgerTestCase):
+    def test_period_movements(self):
+        with self.assertNumQueries(1):
+            rows = {row.name: row.balance for row in period_balances(date(2025, 2, 1), date(2025, 2, 28))}
+        self.assertEqual((rows['Cash'], rows['Rent'], rows['Sales'], rows['Bank Loan']), (100, 200, 0, 300))
+        self.assertEqual(self.cash.get_balance(date(2025, 2, 28), date_from=date(2025, 2, 1)), 100)
+        self.assertEqual(self.cash.get_balance(date_from='2025-01-01'), 600)
+
+    def test_draft_inclusion(self):
+        january = date(2025, 1, 1), date(2025, 1, 31)
+        self.assertEqual(self.rent.get_balance(january[1], date_from=january[0]), 0)
+        self.assertEqual(self.rent.get_balance(january[1], date_from=january[0], status=None), 999)
+        self.assertEqual(self.rent.get_balance(status='Draft'), 999)
+        rows = {row.name: row.balance for row in period_balances(*january, status=None)}
+        self.assertEqual(rows['Cash'], 500 - 999)
+
+    def test_grouped_balances(self):
+        by_type = {
+            row['account_type']: (row['debit_sum'], row['credit_sum'])
+            for row in Transaction.objects.balances(date(2025, 1, 1), group_by='account_type')
+        }
+        self.assertEqual(by_type, {
+            'Asset': (800, 200), 'Expense': (200, 0), 'Liability': (0, 300), 'Revenue': (0, 500),
+        })
+        monthly = list(Transaction.objects.filter(account=self.cash).balances(group_by='month'))
+        self.assertEqual(
+            [(row['month'], row['debit_sum'], row['credit_sum']) for row in monthly],
+            [(date(2024, 12, 1), 1000, 0), (date(2025, 1, 1), 500, 0), (date(2025, 2, 1), 300, 200)],
+        )
+        rows = Transaction.objects.balances(status=None, group_by=('account_type', 'month'))
+        self.assertIn(
+            {'account_type': 'Expense', 'month': date(2025, 1, 1), 'debit_sum': 999, 'credit_sum': 0}, list(rows)
+        )
+        with self.assertRaises(ValueError):
+            Transaction.objects.balances(group_by='journal')
+
+    def test_period_income_statement(self):
+        self.client.force_login(User.objects.create_user('viewer', password='secret'))
+        post_journal([(self.cash, 40, 0), (self.sales, 0, 40)], on=date(2026, 1, 10))
+        close_fiscal_year(2025)
+        for name in ('income-statement', 'income-statement-async'):
+            response = self.client.get(reverse(name), {'from': '2025-02-01', 'date': '2026-01-31'})
+            # The 2025 closing journal falls inside the period and is left out
+            self.assertEqual(
+                (response.context['total_revenue'], response.context['total_expense']), (40, 200), name
+            )
+            self.assertEqual(response.context['selected_from'], '2025-02-01')
+            for bad in ('bad', '2025-02-30'):
+                self.assertEqual(self.client.get(reverse(name), {'from': bad}).status_code, 400, (name, bad))
+
+
+class ComparativeReportTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('analyst', password='secret'))
+
+    def test_period_buckets(self):
+        self.assertEqual(period_buckets(date(2025, 2, 14), 'month', 3), [
+            (date(2024, 12, 1), date(2024, 12, 31)), (date(2025, 1, 1), date(2025, 1, 31)),
+            (date(2025, 2, 1), date(2025, 2, 14)),
+        ])
+        self.assertEqual(period_buckets(date(2025, 5, 31), 'quarter', 2), [
+            (date(2025, 1, 1), date(2025, 3, 31)), (date(2025, 4, 1), date(2025, 5, 31)),
+        ])
+        self.assertEqual(period_buckets(date(2025, 5, 31), 'year', 2)[0], (date(2024, 1, 1), date(2024, 12, 31)))
+
+    def test_columns_match_single_date_reports(self):
+        periods = period_buckets(date(2025, 2, 28), 'month', 3)
+        movements = {row.name: row.balances for row in comparative_balances(periods)}
+        closing = {row.name: row.balances for row in comparative_balances(periods, cumulative=True)}
+        self.assertEqual(movements['Cash'], [1000, 500, 100])
+        self.assertEqual(movements['Rent'], [0, 0, 200])
+        for i, (start, end) in enumerate(periods):
+            for row in balances_as_of(end):
+                self.assertEqual(closing[row.name][i], row.balance, (row.name, end))
+
+    def test_one_query_for_any_number_of_periods(self):
+        for count in (1, 24):
+            with self.assertNumQueries(1):
+                comparative_balances(period_buckets(date(2025, 2, 28), 'month', count), exclude_closing=True)
+
+    def test_comparative_views(self):
+        post_journal([(self.cash, 40, 0), (self.sales, 0, 40)], on=date(2026, 1, 10))
+        close_fiscal_year(2025)
+        for name in ('income-statement', 'income-statement-async'):
+            response = self.client.get(reverse(name), {'compare': 'year', 'periods': 2, 'date': '2026-06-30'})
+            self.assertTemplateUsed(response, 'comparative_report.html')
+            self.assertEqual(response.context['columns'], ['2025', '2026'])
+            # The 2025 closing journal does not wipe out that year's column
+            self.assertEqual(response.context['results'], [('Net Profit', [300, 40])])
+
+        for name in ('balance-sheet', 'balance-sheet-async'):
+            response = self.client.get(reverse(name), {'compare': 'quarter', 'periods': 2, 'date': '2025-03-31'})
+            self.assertEqual(response.context['columns'], ['Q4 2024', 'Q1 2025'])
+            assets, liabilities, equity = response.context['sections']
+            self.assertEqual(assets['total'], [1000, 1600])
+            self.assertEqual(response.context['results'], [('Total Liabilities & Equity', [1000, 1600])])
+
+        self.assertEqual(self.client.get(reverse('balance-sheet'), {'compare': 'week'}).status_code, 400)
+
+
+class AccountTreeTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('controller', password='secret'))
+        self.current = Account.objects.create(name='Current Assets', account_type='Asset')
+        self.cash.refresh_from_db()
+        self.cash.parent = self.current
+        self.cash.save()
+        self.petty = Account.objects.create(name='Petty Cash', account_type='Asset', parent=self.cash)
+        post_journal([(self.petty, 25, 0), (self.capital, 0, 25)], on=date(2025, 2, 10))
+
+    def test_paths_follow_moves(self):
+        self.assertEqual(self.petty.path, self.current.path + self.cash.path[-8:] + f'{self.petty.pk:08d}')
+        assets = Account.objects.create(name='Assets', account_type='Asset')
+        self.current.parent = assets
+        self.current.save()
+        self.petty.refresh_from_db()
+        self.assertEqual(self.petty.depth, 3)
+        self.assertTrue(self.petty.path.startswith(assets.path + f'{self.current.pk:08d}{self.cash.pk:08d}'))
+
+    def test_subtree_balances(self):
+        self.assertEqual(self.current.get_subtree_balance(), 1625)
+        self.assertEqual(self.cash.get_subtree_balance(date(2025, 1, 31)), 1500)
+        with self.assertNumQueries(1):
+            rows = {row.name: row for row in subtree_balances()}
+        self.assertEqual((rows['Current Assets'].balance, rows['Current Assets'].own.balance), (1625, 0))
+        self.assertEqual((rows['Cash'].balance, rows['Cash'].depth, rows['Cash'].has_children), (1625, 1, True))
+        self.assertFalse(rows['Petty Cash'].has_children)
+
+        response = self.client.get(reverse('account-list'), {'search': 'current'})
+        self.assertEqual([(row.name, row.balance) for row in response.context['accounts']], [('Current Assets', 1625)])
+
+    def test_reports_roll_up_subtrees(self):
+        for name in ('trial-balance', 'trial-balance-async'):
+            response = self.client.get(reverse(name), {'date': '2025-02-28'})
+            entries = {entry['account']: entry for entry in response.context['trial_balance']}
+            self.assertEqual(entries['Current Assets']['subtree_debit'], 1625)
+            self.assertEqual((entries['Current Assets']['debit'], entries['Cash']['debit']), (0, 1600))
+            self.assertEqual(response.context['total_debit'], response.context['total_credit'])
+            names = [entry['account'] for entry in response.context['trial_balance']]
+            start = names.index('Current Assets')
+            self.assertEqual(names[start:start + 3], ['Current Assets', 'Cash', 'Petty Cash'])
+
+        response = self.client.get(reverse('balance-sheet'))
+        self.assertEqual([(row.name, row.balance) for row in response.context['assets']], [
+            ('Current Assets', 1625), ('Cash', 1625), ('Petty Cash', 25),
+        ])
+        self.assertEqual(response.context['total_assets'], 1625)
+
+        text = b''.join(self.client.get(reverse('trial-balance-export')).streaming_content).decode()
+        self.assertNotIn('Current Assets', [row[0] for row in csv.reader(io.StringIO(text))])
+
+    def test_parent_validation(self):
+        url = reverse('account-edit', args=[self.current.pk])
+        response = self.client.post(url, {'name': 'Current Assets', 'account_type': 'Asset', 'parent': self.petty.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('parent', response.context['form'].errors)
+        response = self.client.post(
+            reverse('account-add'), {'name': 'Deposits', 'account_type': 'Liability', 'parent': self.cash.pk},
+        )
+        self.assertIn('parent', response.context['form'].errors)
+
+        # A parent cannot change type from under its sub-accounts
+        response = self.client.post(url, {'name': 'Current Assets', 'account_type': 'Liability'})
+        self.assertIn('account_type', response.context['form'].errors)
+        self.current.refresh_from_db()
+        self.assertEqual(self.current.account_type, 'Asset')
+        response = self.client.post(reverse('account-edit', args=[self.petty.pk]), {
+            'name': 'Petty Cash', 'account_type': 'Liability',
+        })
+        self.assertEqual(response.status_code, 302)  # a leaf may, once moved out of the tree
+
+        self.client.post(reverse('account-delete', args=[self.current.pk]))
+        self.assertTrue(Account.objects.filter(pk=self.current.pk).exists())
+
+    def test_bulk_created_accounts_get_paths(self):
+        Account.objects.bulk_create([Account(name='Bulk', account_type='Asset')])
+        Account.fill_paths()
+        bulk = Account.objects.get(name='Bulk')
+        self.assertEqual(bulk.path, f'{bulk.pk:08d}')
+
+
+class ReportQueryCountTests(LedgerTestCase):
+    """Report pages run a fixed number of queries however large the chart of accounts is."""
+
+    REPORT_QUERIES = {
+        'dashboard': 5,
+        'account-list': 3,
+        'trial-balance': 5,
+        'income-statement': 5,
+        'balance-sheet': 5,
+    }
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('auditor', password='secret')
+        self.client.force_login(user)
+        CompanySettings.current()  # warm caches, as on any server past its first request
+
+    def assertReportQueries(self):
+        for name, expected in self.REPORT_QUERIES.items():
+            with self.subTest(report=name), self.assertNumQueries(expected):
+                response = self.client.get(reverse(name), {'date': '2025-01-31'})
+                self.assertEqual(response.status_code, 200)
+
+    def test_query_count_is_fixed(self):
+        self.assertReportQueries()
+        for i in range(30):
+            account = Account.objects.create(name=f'Expense {i}', account_type='Expense')
+            post_journal([(account, 10, 0), (self.cash, 0, 10)])
+        self.assertReportQueries()
+
+    def test_rows_respect_selected_date(self):
+        response = self.client.get(reverse('balance-sheet'), {'date': '2024-12-31'})
+        assets = {row.name: row.balance for row in response.context['assets']}
+        self.assertEqual(assets['Cash'], Decimal('1000'))
+
+
+class BalanceBatchApiTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('clerk', password='secret'))
+
+    def get(self, **params):
+        return self.client.get(reverse('account-balances-api'), params)
+
+    def test_many_accounts_in_one_query(self):
+        ids = f'{self.cash.pk},{self.loan.pk},0'
+        with self.assertNumQueries(5):  # session, user, ETag version, cache version, balances
+            data = self.get(ids=ids).json()
+        self.assertEqual(set(data['balances']), {str(self.cash.pk), str(self.loan.pk)})
+        self.assertEqual(data['balances'][str(self.cash.pk)]['balance'], 1600.0)
+        self.assertEqual(data['balances'][str(self.loan.pk)]['balance'], 300.0)
+        self.assertEqual(data['missing'], [0])
+
+    def test_date_and_status_filters(self):
+        def cash(**params):
+            return self.get(ids=self.cash.pk, **params).json()['balances'][str(self.cash.pk)]['balance']
+
+        self.assertEqual(cash(date='2025-01-31'), 1500.0)
+        self.assertEqual(cash(date='2025-01-31', status='Draft'), -999.0)
+        self.assertEqual(cash(date='2025-01-31', status='All'), 501.0)
+        self.assertEqual(cash(status='All'), 601.0)
+
+    def test_unchanged_balances_return_304(self):
+        first = self.get(ids=self.cash.pk)
+        etag = first['ETag']
+        response = self.client.get(reverse('account-balances-api'), {'ids': self.cash.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.force_login(User.objects.create_user('auditor', password='secret'))
+        self.client.post(reverse('journal-create'), self.journal_post_data([(self.cash, 5, 0), (self.sales, 0, 5)]))
+        response = self.client.get(reverse('account-balances-api'), {'ids': self.cash.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['balances'][str(self.cash.pk)]['balance'], 1605.0)
+
+    def test_bad_parameters(self):
+        for params in ({'ids': 'cash'}, {'ids': '1', 'date': 'soon'}, {'ids': '1', 'status': 'Void'}):
+            with self.subTest(**params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+    def test_anonymous_requests_are_redirected_to_login(self):
+        self.client.logout()
+        response = self.get(ids=f'{self.cash.pk},{self.loan.pk}')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response['Location'])
+
+
+class AsyncReportTests(LedgerTestCase):
+    """The async report endpoints show exactly what their sync counterparts show."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('auditor', password='secret'))
+
+    def test_reports_match_sync_views(self):
+        for name, keys in (
+            ('trial-balance', ['trial_balance', 'total_debit', 'total_credit']),
+            ('income-statement', ['revenues', 'expenses', 'total_revenue', 'total_expense', 'net_profit']),
+            ('balance-sheet', ['assets', 'liabilities', 'equity_accounts', 'net_profit', 'total_liab_equity']),
+        ):
+            for params in ({}, {'date': '2025-01-31'}):
+                with self.subTest(report=name, **params):
+                    expected = self.client.get(reverse(name), params).context
+                    report_cache.clear()
+                    actual = self.client.get(reverse(f'{name}-async'), params).context
+                    for key in keys:
+                        self.assertEqual(repr(actual[key]), repr(expected[key]), key)
+
+    def test_balance_api_matches_sync_api(self):
+        for account_id in (self.cash.pk, self.loan.pk, 0):
+            expected = self.client.get(reverse('account-balance-api', args=[account_id]))
+            actual = self.client.get(reverse('account-balance-api-async', args=[account_id]))
+            self.assertEqual((actual.status_code, actual.json()), (expected.status_code, expected.json()))
+        response = self.client.post(reverse('account-balance-api-async', args=[self.cash.pk]))
+        self.assertEqual(response.status_code, 405)
+
+    def test_other_accounts_are_covered_and_cached_rows_stay_complete(self):
+        suspense = Account.objects.create(name='Suspense', account_type='Other')
+        post_journal([(self.cash, 100, 0), (suspense, 0, 100)], on=date(2025, 3, 1))
+        # The async views fill the report cache first; the sync views then read those entries
+        self.client.get(reverse('trial-balance-async'))
+        self.assertEqual(self.client.get(reverse('account-balance-api-async', args=[suspense.pk])).status_code, 200)
+
+        response = self.client.get(reverse('trial-balance'))
+        self.assertEqual(response.context['total_debit'], response.context['total_credit'])
+        self.assertIn('Suspense', [entry['account'] for entry in response.context['trial_balance']])
+        response = self.client.get(reverse('account-balance-api', args=[suspense.pk]))
+        self.assertEqual((response.status_code, response.json()['balance']), (200, 100.0))
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(reverse('balance-sheet-async'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(settings.LOGIN_URL))
+
+
+class ConcurrentSectionTests(TransactionTestCase):
+    def test_sections_run_on_worker_threads(self):
+        Account.objects.create(name='Cash', account_type='Asset')
+        callers = []
+
+        def section(name):
+            callers.append(threading.get_ident())
+            return Account.objects.filter(name=name).count()
+
+        results = async_to_sync(run_concurrently)(partial(section, 'Cash'), partial(section, 'Sales'))
+        self.assertEqual(results, [1, 0])
+        self.assertNotIn(threading.get_ident(), callers)
+
+    def test_sections_share_the_callers_transaction(self):
+        callers = []
+
+        def section():
+            callers.append(threading.get_ident())
+            return Account.objects.count()
+
+        with transaction.atomic():
+            Account.objects.create(name='Cash', account_type='Asset')  # not visible to other connections
+            results = async_to_sync(run_concurrently)(section, section)
+        self.assertEqual(results, [1, 1])
+        self.assertEqual(set(callers), {threading.get_ident()})
+
+
+class DashboardCacheTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('auditor', password='secret')
+        self.client.force_login(user)
+        CompanySettings.current()
+
+    def test_figures_come_from_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            figures = dashboard_figures(2025)
+        self.assertEqual(figures['available_years'], [2025, 2024])
+        self.assertEqual(figures['monthly_revenue'][0], 500.0)
+        self.assertEqual(figures['monthly_expense'][:2], [0, 200.0])
+        for account_type, balance in figures['type_balances'].items():
+            self.assertEqual(balance, total_balance(balances_as_of(), account_type))
+
+    def test_reload_is_cached_until_the_ledger_changes(self):
+        url = reverse('dashboard')
+        self.client.get(url, {'year': 2025})
+        with self.assertNumQueries(3):  # session, user, ledger version
+            response = self.client.get(url, {'year': 2025})
+        self.assertEqual(response.context['total_revenue'], Decimal('500'))
+
+        post_journal([(self.cash, 40, 0), (self.sales, 0, 40)], on=date(2025, 3, 1))
+        response = self.client.get(url, {'year': 2025})
+        self.assertEqual(response.context['total_revenue'], Decimal('540'))
+        self.assertEqual(json.loads(response.context['monthly_revenue'])[2], 40.0)
+
+        self.client.post(reverse('account-add'), {'name': 'Petty Cash', 'account_type': 'Asset'})
+        response = self.client.get(url, {'year': 2025})
+        self.assertIn('Petty Cash', [row.name for row in response.context['accounts']])
+
+
+class ReportCacheTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('auditor', password='secret')
+        self.client.force_login(user)
+        CompanySettings.current()
+
+    def balance_sheet_cash(self):
+        response = self.client.get(reverse('balance-sheet'))
+        return {row.name: row.balance for row in response.context['assets']}['Cash']
+
+    def test_hits_until_a_journal_changes(self):
+        self.assertEqual(self.balance_sheet_cash(), Decimal('1600'))
+        with self.assertNumQueries(3):  # session, user, ledger version
+            self.assertEqual(self.balance_sheet_cash(), Decimal('1600'))
+        self.assertEqual((report_cache.hits, report_cache.misses), (1, 1))
+
+        self.client.post(reverse('journal-create'), self.journal_post_data([(self.cash, 50, 0), (self.sales, 0, 50)]))
+        self.assertEqual(self.balance_sheet_cash(), Decimal('1650'))
+        journal = Journal.objects.latest('id')
+        self.client.post(reverse('journal-delete', args=[journal.pk]))
+        self.assertEqual(self.balance_sheet_cash(), Decimal('1600'))
+        self.assertEqual(report_cache.misses, 3)
+
+    def test_entries_are_keyed_by_date(self):
+        url = reverse('trial-balance')
+        january = self.client.get(url, {'date': '2025-01-31'}).context['total_debit']
+        february = self.client.get(url, {'date': '2025-02-28'}).context['total_debit']
+        self.assertEqual(self.client.get(url, {'date': '2025-01-31'}).context['total_debit'], january)
+        self.assertNotEqual(january, february)
+        self.assertEqual((report_cache.hits, report_cache.misses), (1, 2))
+
+    def test_balance_api_follows_account_changes(self):
+        url = reverse('account-balance-api', args=[self.cash.pk])
+        self.assertEqual(self.client.get(url).json()['balance'], 1600.0)
+        account = Account.objects.create(name='Petty Cash', account_type='Asset')
+        self.assertEqual(self.client.get(reverse('account-balance-api', args=[account.pk])).status_code, 404)
+        self.client.post(reverse('account-edit', args=[account.pk]), {'name': 'Till', 'account_type': 'Asset'})
+        self.assertEqual(self.client.get(reverse('account-balance-api', args=[account.pk])).json()['account_name'], 'Till')
+        self.client.post(reverse('account-delete', args=[account.pk]))
+        self.assertEqual(self.client.get(reverse('account-balance-api', args=[account.pk])).status_code, 404)
+
+    def test_balance_api_sees_accounts_added_from_the_journal_form(self):
+        self.assertEqual(self.client.get(reverse('account-balance-api', args=[self.cash.pk])).status_code, 200)
+        response = self.client.post(
+            reverse('ajax-add-account'), json.dumps({'name': 'Petty Cash', 'account_type': 'Asset'}),
+            content_type='application/json',
+        )
+        account_id = response.json()['id']
+        response = self.client.get(reverse('account-balance-api', args=[account_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['balance'], 0.0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = ReportCache(max_entries=2)
+        lru.get('a', None, lambda: 1)
+        lru.get('b', None, lambda: 2)
+        lru.get('a', None, lambda: 'recomputed')
+        lru.get('c', None, lambda: 3)
+        self.assertEqual(lru.get('a', None, lambda: 'recomputed'), 1)
+        self.assertEqual(lru.get('b', None, lambda: 'recomputed'), 'recomputed')
+        self.assertEqual(lru.stats()['entries'], 2)
+
+
+class CompanySettingsCacheTests(LedgerTestCase):
+    def test_missing_row_is_cached_too(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(CompanySettings.current())
+            self.assertIsNone(CompanySettings.current())
+
+    def test_save_and_delete_invalidate(self):
+        settings = CompanySettings.objects.create(company_name='Acme')
+        self.assertEqual(CompanySettings.current().company_name, 'Acme')
+        settings.company_name = 'Acme Ltd'
+        settings.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(CompanySettings.current().company_name, 'Acme Ltd')
+        settings.delete()
+        self.assertIsNone(CompanySettings.current())
+
+    def test_edit_from_another_worker_shows_up_after_the_timeout(self):
+        self.assertIsNone(CompanySettings.current())
+        with mock.patch.object(cache, 'delete'):  # another process: this one's cache is not cleared
+            CompanySettings.objects.create(company_name='Acme')
+        self.assertIsNone(CompanySettings.current())
+        expired = time.time() + CompanySettings.CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=expired):
+            self.assertEqual(CompanySettings.current().company_name, 'Acme')
+
+
+class PeriodBalanceTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(user)
+
+    def test_large_changes_use_bulk_statements(self):
+        months = [date(2021 + i // 12, i % 12 + 1, 1) for i in range(60)]  # up to Dec 2025
+        change = {(self.cash.pk, month): (Decimal('1'), Decimal('0')) for month in months}
+        january = AccountPeriodBalance.objects.get(account=self.cash, period=date(2025, 1, 1)).debit
+        # version, closed-year check, account totals, then one upsert between savepoint statements
+        with self.assertNumQueries(6):
+            record_posting_change({}, change)
+        self.assertEqual(AccountPeriodBalance.objects.get(account=self.cash, period=date(2025, 1, 1)).debit, january + 1)
+        self.assertEqual(AccountPeriodBalance.objects.filter(account=self.cash, debit__gte=1).count(), 60)
+        record_posting_change(change, {})
+        self.assertEqual(check_period_balances(), [])
+
+    def test_snapshots_follow_create_edit_and_delete(self):
+        self.client.post(reverse('journal-create'), self.journal_post_data([(self.cash, 50, 0), (self.sales, 0, 50)]))
+        journal = Journal.objects.latest('id')
+        self.assertEqual(check_period_balances(), [])
+        march = AccountPeriodBalance.objects.get(account=self.cash, period=date(2025, 3, 1))
+        self.assertEqual(march.debit, Decimal('50'))
+
+        self.client.post(
+            reverse('journal-edit', args=[journal.pk]),
+            self.journal_post_data([(self.cash, 80, 0), (self.sales, 0, 80)], on='2025-04-02', save_draft='1'),
+        )
+        self.assertEqual(check_period_balances(), [])
+        self.assertFalse(journal.transactions.filter(posted_date__isnull=False).exists())
+        self.client.post(
+            reverse('journal-edit', args=[journal.pk]),
+            self.journal_post_data([(self.cash, 80, 0), (self.sales, 0, 80)], on='2025-04-02'),
+        )
+        self.assertEqual(check_period_balances(), [])
+        april = AccountPeriodBalance.objects.get(account=self.cash, period=date(2025, 4, 1))
+        self.assertEqual(april.debit, Decimal('80'))
+
+        self.client.post(reverse('journal-delete', args=[journal.pk]))
+        self.assertEqual(check_period_balances(), [])
+
+    def test_checker_detects_and_rebuild_fixes_drift(self):
+        AccountPeriodBalance.objects.filter(account=self.cash).update(debit=0)
+        self.assertTrue(check_period_balances())
+        rebuild_period_balances()
+        self.assertEqual(check_period_balances(), [])
+
+    def test_as_of_uses_snapshots_plus_partial_month(self):
+        post_journal([(self.cash, 40, 0), (self.sales, 0, 40)], on=date(2025, 2, 25))
+        rows = {row.name: row.balance for row in balances_as_of('2025-02-21')}
+        self.assertEqual(rows['Cash'], Decimal('1600'))
+        rows = {row.name: row.balance for row in balances_as_of('2025-02-25')}
+        self.assertEqual(rows['Cash'], Decimal('1640'))
+
+
+class AccountTotalsTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('auditor', password='secret'))
+
+    def totals(self, account):
+        return Account.objects.values_list('debit_total', 'credit_total').get(pk=account.pk)
+
+    def test_totals_follow_journal_changes(self):
+        self.assertEqual(self.totals(self.cash), (Decimal('1800'), Decimal('200')))
+
+        self.client.post(reverse('journal-create'), self.journal_post_data([(self.cash, 50, 0), (self.sales, 0, 50)]))
+        journal = Journal.objects.latest('pk')
+        self.assertEqual(self.totals(self.cash), (Decimal('1850'), Decimal('200')))
+
+        self.client.post(reverse('journal-edit', args=[journal.pk]), self.journal_post_data(
+            [(self.cash, 70, 0), (self.sales, 0, 70)], save_draft='1',
+        ))
+        self.assertEqual(self.totals(self.cash), (Decimal('1800'), Decimal('200')))
+
+        self.client.post(reverse('journal-edit', args=[journal.pk]), self.journal_post_data(
+            [(self.cash, 70, 0), (self.sales, 0, 70)],
+        ))
+        self.assertEqual(self.totals(self.sales), (Decimal('0'), Decimal('570')))
+
+        self.client.post(reverse('journal-delete', args=[journal.pk]))
+        self.assertEqual(self.totals(self.sales), (Decimal('0'), Decimal('500')))
+        self.assertEqual(check_account_totals(), [])
+
+    def test_journal_deleted_by_a_concurrent_request_is_counted_once(self):
+        journal = Journal.objects.get(date=date(2025, 2, 20))
+        stale = Journal.objects.get(pk=journal.pk)
+        self.client.post(reverse('journal-delete', args=[journal.pk]))
+        cash = self.totals(self.cash)
+
+        # A second submit, and an edit, that both loaded the journal before the delete committed
+        with mock.patch('accounting.views.get_object_or_404', return_value=stale):
+            response = self.client.post(reverse('journal-delete', args=[journal.pk]), follow=True)
+            self.assertIn('Journal was already deleted.', [str(m) for m in response.context['messages']])
+            response = self.client.post(reverse('journal-edit', args=[journal.pk]), self.journal_post_data(
+                [(self.cash, 300, 0), (self.loan, 0, 300)], on='2025-02-20',
+            ), follow=True)
+            self.assertIn(
+                'This journal was deleted while you were editing it.', [str(m) for m in response.context['messages']],
+            )
+        JournalAdmin(Journal, admin.site).delete_model(None, stale)
+
+        self.assertFalse(Journal.objects.filter(pk=journal.pk).exists())
+        self.assertEqual(self.totals(self.cash), cash)
+        self.assertEqual(check_account_totals(), [])
+        self.assertEqual(check_period_balances(), [])
+
+    def test_stale_save_keeps_totals(self):
+        stale = Account.objects.get(pk=self.cash.pk)
+        post_journal([(self.cash, 25, 0), (self.sales, 0, 25)])
+        stale.name = 'Petty Cash'
+        stale.save()
+        self.assertEqual(self.totals(self.cash), (Decimal('1825'), Decimal('200')))
+
+    def test_undated_balances_read_the_columns(self):
+        with self.assertNumQueries(1), mock.patch('accounting.balances._account_sum') as account_sum:
+            rows = {row.id: row.balance for row in balances_as_of()}
+        account_sum.assert_not_called()
+        self.assertEqual(rows[self.cash.pk], Decimal('1600'))
+
+    def test_reconcile_command_fixes_drift(self):
+        Account.objects.filter(pk=self.cash.pk).update(debit_total=1)
+        version = ledger_version()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_account_totals', '--check', stdout=io.StringIO())
+
+        call_command('reconcile_account_totals', stdout=io.StringIO())
+        self.assertEqual(self.totals(self.cash), (Decimal('1800'), Decimal('200')))
+        self.assertEqual(check_account_totals(), [])
+        self.assertGreater(ledger_version(), version)
+
+
+class FiscalYearCloseTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('auditor', password='secret'))
+        post_journal([(self.cash, 40, 0), (self.sales, 0, 40)], on=date(2026, 1, 10))
+
+    def test_closing_moves_results_into_equity(self):
+        call_command('close_fiscal_year', '2025', stdout=io.StringIO())
+        fiscal_close = FiscalYearClose.objects.get(year=2025)
+        lines = set(fiscal_close.closing_journal.transactions.values_list('account__name', 'debit', 'credit'))
+        self.assertEqual(lines, {
+            ('Sales', Decimal('500'), Decimal('0')),
+            ('Rent', Decimal('0'), Decimal('200')),
+            ('Retained Earnings', Decimal('0'), Decimal('300')),
+        })
+        rows = {row.name: row.balance for row in balances_as_of(date(2026, 1, 31))}
+        self.assertEqual((rows['Sales'], rows['Rent'], rows['Retained Earnings']), (40, 0, 300))
+        self.assertEqual(OpeningBalance.objects.get(account=self.cash, year=2026).debit, Decimal('1800'))
+
+    def test_reports_from_opening_rows_match_raw_sums(self):
+        close_fiscal_year(2024)
+        close_fiscal_year(2025)
+        for as_of in (date(2024, 12, 31), date(2025, 1, 31), date(2025, 12, 31), date(2026, 1, 9), date(2026, 2, 1)):
+            rows = {row.id: row.balance for row in balances_as_of(as_of)}
+            for account in Account.objects.all():
+                self.assertEqual(rows[account.id], account.get_balance(as_of), (account, as_of))
+
+        with CaptureQueriesContext(connection) as queries:
+            balances_as_of(date(2026, 3, 31))
+        sql = queries[-1]['sql']
+        self.assertIn('accounting_openingbalance', sql)
+        self.assertIn("'2026-01-01'", sql)  # snapshots only from the opening year on
+
+        sheet = self.client.get(reverse('balance-sheet'), {'date': '2026-01-31'}).context
+        self.assertEqual(sheet['total_assets'], sheet['total_liab_equity'])
+        self.assertEqual(sheet['net_profit'], 40)
+
+    def test_income_statement_of_a_closed_year_still_shows_its_results(self):
+        close_fiscal_year(2025)
+        for name in ('income-statement', 'income-statement-async'):
+            report = self.client.get(reverse(name), {'date': '2025-12-31'}).context
+            self.assertEqual((report['total_revenue'], report['total_expense']), (500, 200), name)
+            report = self.client.get(reverse(name), {'date': '2026-01-31'}).context
+            self.assertEqual((report['total_revenue'], report['total_expense']), (40, 0), name)
+
+    def test_close_made_by_another_worker_is_seen(self):
+        self.client.get(reverse('income-statement'), {'date': '2025-12-31'})
+        balances_as_of(date(2026, 1, 31))
+        # Another process closes the year: nothing in this process's cache is cleared
+        with mock.patch.object(cache, 'delete'):
+            close_fiscal_year(2025)
+        report = self.client.get(reverse('income-statement'), {'date': '2025-12-31'}).context
+        self.assertEqual((report['total_revenue'], report['total_expense']), (500, 200))
+        rows = {row.name: row.balance for row in balances_as_of(date(2026, 1, 31))}
+        self.assertEqual((rows['Sales'], rows['Retained Earnings']), (40, 300))
+
+    def test_closed_years_are_locked(self):
+        journal = Journal.objects.get(date=date(2025, 2, 20))
+        close_fiscal_year(2025)
+
+        response = self.client.post(reverse('journal-edit', args=[journal.pk]), self.journal_post_data(
+            [(self.cash, 1, 0), (self.loan, 0, 1)], on='2026-03-01',
+        ))
+        self.assertContains(response, 'Fiscal year 2025 is closed')
+        response = self.client.post(reverse('journal-create'), self.journal_post_data(
+            [(self.cash, 1, 0), (self.loan, 0, 1)], on='2025-06-01',
+        ))
+        self.assertContains(response, 'Fiscal year 2025 is closed')
+        self.client.post(reverse('journal-delete', args=[journal.pk]))
+        self.assertTrue(Journal.objects.filter(pk=journal.pk).exists())
+
+        with self.assertRaises(ClosedPeriodError):
+            post_journal([(self.cash, 1, 0), (self.loan, 0, 1)], on=date(2024, 5, 1))
+        report = import_journals(io.StringIO(
+            "journal,date,description,status,account,debit,credit\n"
+            "1,2025-03-01,Late,Posted,Cash,5,\n"
+            "1,2025-03-01,Late,Posted,Sales,,5\n"
+        ))
+        self.assertIn('Fiscal year 2025 is closed', report.errors[0]['message'])
+
+    def test_years_close_in_order_once_ended(self):
+        close_fiscal_year(2025)
+        for year in (2024, 2025, date.today().year):
+            with self.subTest(year=year), self.assertRaises(CommandError):
+                call_command('close_fiscal_year', str(year), stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('close_fiscal_year', '2025', '--equity-account', 'Cash', stdout=io.StringIO())
+
+
+class JournalEditTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('clerk', password='secret'))
+
+    def journal_with_lines(self, pairs):
+        return post_journal([(self.cash, 10, 0), (self.sales, 0, 10)] * pairs, on=date(2025, 6, 1))
+
+    def edit_data(self, journal):
+        """Form data resubmitting `journal` unchanged: lines 2 and 3 get deleted and a new pair is added."""
+        lines = list(journal.transactions.order_by('pk'))
+        data = self.journal_post_data(
+            [(line.account, line.debit, line.credit) for line in lines] + [(self.rent, 7, 0), (self.cash, 0, 7)],
+            on='2025-06-01', **{'transactions-INITIAL_FORMS': str(len(lines))},
+        )
+        for i, line in enumerate(lines):
+            data[f'transactions-{i}-id'] = line.pk
+            data[f'transactions-{i}-journal'] = journal.pk
+        data['transactions-0-debit'] = data['transactions-1-credit'] = 15
+        data['transactions-2-DELETE'] = data['transactions-3-DELETE'] = 'on'
+        return data
+
+    def test_edit_applies_a_diff(self):
+        journal = self.journal_with_lines(3)
+        lines = list(journal.transactions.order_by('pk').values_list('pk', flat=True))
+        self.client.post(reverse('journal-edit', args=[journal.pk]), self.edit_data(journal))
+
+        rows = list(journal.transactions.order_by('pk').values_list('pk', 'account', 'debit', 'credit', 'posted_date'))
+        self.assertEqual([row[0] for row in rows[:4]], [lines[0], lines[1], lines[4], lines[5]])
+        self.assertEqual([row[1:4] for row in rows], [
+            (self.cash.pk, 15, 0), (self.sales.pk, 0, 15), (self.cash.pk, 10, 0), (self.sales.pk, 0, 10),
+            (self.rent.pk, 7, 0), (self.cash.pk, 0, 7),
+        ])
+        self.assertEqual({row[4] for row in rows}, {date(2025, 6, 1)})
+        self.assertEqual(check_period_balances(), [])
+        self.assertEqual(check_account_totals(), [])
+
+    def test_edit_query_count_does_not_grow_with_lines(self):
+        post_journal([(self.rent, 1, 0), (self.cash, 0, 1)], on=date(2025, 6, 1))  # June snapshot rows exist
+        counts = []
+        for pairs in (5, 100):
+            journal = self.journal_with_lines(pairs)
+            data = self.edit_data(journal)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('journal-edit', args=[journal.pk]), data)
+            self.assertEqual(response.status_code, 302)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class AccountChoicesTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('clerk', password='secret'))
+        Account.objects.bulk_create(Account(name=f'Payroll {i:03}', account_type='Expense') for i in range(120))
+        Account.clear_names()
+
+    def test_journal_form_renders_only_selected_accounts(self):
+        small = post_journal([(self.cash, 10, 0), (self.sales, 0, 10)])
+        large = post_journal([(self.rent, 1, 0), (self.cash, 0, 1)] * 40)
+        self.client.get(reverse('journal-edit', args=[small.pk]))  # warm the session and account name caches
+        counts = []
+        for journal in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('journal-edit', args=[journal.pk]))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertNotContains(response, 'Payroll 007')
+        self.assertContains(response, f'<option value="{self.rent.pk}" selected>Rent</option>', count=40)
+
+    def test_bound_formset_loads_only_the_submitted_accounts(self):
+        data = self.journal_post_data([(self.cash, 10, 0), (self.sales, 0, 10)])
+        data.update({'transactions-TOTAL_FORMS': '3', 'transactions-2-account': 'cash'})
+        formset = TransactionFormSet(data, instance=Journal())
+        formset.is_valid()
+        self.assertEqual(set(formset.accounts), {self.cash.pk, self.sales.pk})
+        self.assertEqual(formset.forms[0].cleaned_data['account'], self.cash)
+
+    def test_names_cache_follows_account_changes(self):
+        self.assertNotIn('Petty Cash', Account.names().values())
+        petty = Account.objects.create(name='Petty Cash', account_type='Asset')
+        self.assertEqual(Account.names()[petty.pk], 'Petty Cash')
+        petty.delete()
+        self.assertNotIn(petty.pk, Account.names())
+
+    def test_account_added_by_another_worker_still_renders(self):
+        Account.names()
+        with mock.patch.object(cache, 'delete'):  # another process: this one's cache is not cleared
+            petty = Account.objects.create(name='Petty Cash', account_type='Asset')
+        journal = post_journal([(petty, 10, 0), (self.sales, 0, 10)])
+        response = self.client.get(reverse('journal-edit', args=[journal.pk]))
+        self.assertContains(response, f'<option value="{petty.pk}" selected>Petty Cash</option>')
+
+        expired = time.time() + Account.NAMES_CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=expired):
+            self.assertEqual(Account.names()[petty.pk], 'Petty Cash')
+
+    def test_autocomplete_prefix_search(self):
+        url = reverse('account-autocomplete')
+        data = self.client.get(url, {'q': 'payroll 00'}).json()
+        self.assertEqual([row['text'] for row in data['results']], [f'Payroll {i:03}' for i in range(10)])
+        self.assertFalse(data['pagination']['more'])
+
+        first, second = (self.client.get(url, {'q': 'Pay', 'page': page}).json() for page in (1, 2))
+        self.assertTrue(first['pagination']['more'])
+        self.assertEqual(second['results'][0]['text'], 'Payroll 020')
+        self.assertEqual(self.client.get(url, {'q': 'ash'}).json()['results'], [])
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url, {'q': 'Pay'}).status_code, 302)
+
+
+class JournalListPaginationTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(user)
+
+    def test_pages_follow_date_id_order_in_both_directions(self):
+        for i in range(7):
+            post_journal([(self.cash, 1, 0), (self.sales, 0, 1)], on=date(2025, 3, 1))
+        expected = list(Journal.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+        seen, pages, params = [], [], {}
+        while True:
+            page = keyset_paginate(
+                Journal.objects.all(), ('date', 'id'), per_page=3, descending=True, **params
+            )
+            pages.append(page)
+            seen += [journal.id for journal in page]
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+        self.assertFalse(pages[0].has_previous)
+        response = self.client.get(reverse('journal-list'))
+        self.assertContains(response, f'{len(expected)} Records')
+
+        back = keyset_paginate(
+            Journal.objects.all(), ('date', 'id'), per_page=3, descending=True,
+            before=pages[2].previous_cursor,
+        )
+        self.assertEqual([journal.id for journal in back], [journal.id for journal in pages[1]])
+
+    def test_search_annotates_totals_without_duplicates(self):
+        post_journal([(self.cash, 70, 0), (self.cash, 30, 0), (self.sales, 0, 100)], description='Cash sale')
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('journal-list'), {'search': 'cash'})
+        journals = list(response.context['journals'])
+        self.assertEqual(len(journals), len({journal.id for journal in journals}))
+        sale = next(journal for journal in journals if journal.description == 'Cash sale')
+        self.assertEqual(sale.total_amount, Decimal('100'))
+        self.assertEqual(sale.line_count, 3)
+
+
+class JournalSearchTests(LedgerTestCase):
+    def test_prefix_match_requires_every_term_and_ranks_descriptions_first(self):
+        by_name = post_journal([(self.rent, 5, 0), (self.cash, 0, 5)], description='Office supplies')
+        by_text = post_journal([(self.sales, 0, 5), (self.cash, 5, 0)], description='Rental income March')
+        ranked = [pk for pk, rank in rank_journals('ren')]
+        self.assertEqual(ranked[:2], [by_text.pk, by_name.pk])
+        self.assertEqual([pk for pk, rank in rank_journals('rent office')], [by_name.pk])
+        self.assertEqual(rank_journals('   '), [])
+
+    def test_index_follows_journal_edits_and_account_renames(self):
+        user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(user)
+        journal = post_journal([(self.rent, 5, 0), (self.cash, 0, 5)], description='Monthly bill')
+        self.client.post(reverse('account-edit', args=[self.rent.pk]), {'name': 'Premises', 'account_type': 'Expense'})
+        self.assertIn(journal.pk, [pk for pk, rank in rank_journals('premises')])
+        self.assertNotIn(journal.pk, [pk for pk, rank in rank_journals('rent')])
+
+    def test_journal_list_pages_through_every_match(self):
+        self.client.force_login(User.objects.create_user('clerk', password='secret'))
+        refunds = {post_journal([(self.sales, 1, 0), (self.cash, 0, 1)], description=f'Refund {i}').pk for i in range(55)}
+        url = reverse('journal-list')
+        response = self.client.get(url, {'search': 'refund'})
+        self.assertContains(response, '55 Records &middot; 50 on this page')
+        first = response.context
+        self.assertEqual(len(first['journals']), 50)
+        self.assertIsNone(first['previous_query'])
+        second = self.client.get(f"{url}?{first['next_query']}").context
+        self.assertEqual({journal.pk for journal in first['journals']} | {journal.pk for journal in second['journals']}, refunds)
+        self.assertIsNone(second['next_query'])
+        back = self.client.get(f"{url}?{second['previous_query']}").context
+        self.assertEqual([journal.pk for journal in back['journals']], [journal.pk for journal in first['journals']])
+
+
+class LedgerViewTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(user)
+        for month in range(3, 9):
+            for day in (5, 5, 20):
+                post_journal([(self.cash, 10, 0), (self.sales, 0, 10)], on=date(2025, month, day))
+
+    def running_balances(self, **params):
+        rows, params = [], dict(params)
+        while True:
+            response = self.client.get(reverse('ledger', args=[self.cash.pk]), params)
+            rows += [(entry['journal_ref'], entry['balance']) for entry in response.context['ledger_data']]
+            if not response.context['page'].has_next:
+                return rows, response
+            params['after'] = response.context['page'].next_cursor
+
+    @mock.patch('accounting.views.LEDGER_PAGE_SIZE', 4)
+    def test_paged_running_balance_matches_full_ledger(self):
+        lines = Transaction.objects.filter(account=self.cash, posted_date__isnull=False).order_by('posted_date', 'id')
+        expected, balance = [], 0
+        for line in lines:
+            balance += line.debit - line.credit
+            expected.append((line.journal_id, balance))
+
+        rows, response = self.running_balances()
+        self.assertEqual(rows, expected)
+        self.assertEqual(response.context['current_balance'], balance)
+
+    @mock.patch('accounting.views.LEDGER_PAGE_SIZE', 4)
+    def test_date_range_seeds_opening_balance(self):
+        rows, response = self.running_balances(**{'from': '2025-05-01', 'to': '2025-06-30'})
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0][1], self.cash.get_balance('2025-04-30') + 10)
+        self.assertEqual(response.context['current_balance'], self.cash.get_balance('2025-06-30'))
+
+    @mock.patch('accounting.views.LEDGER_PAGE_SIZE', 4)
+    def test_query_count_does_not_grow_with_history(self):
+        url = reverse('ledger', args=[self.cash.pk])
+        CompanySettings.current()
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url, {'from': '2025-08-01'})
+        for month in range(1, 13):
+            post_journal([(self.cash, 1, 0), (self.sales, 0, 1)], on=date(2023, month, 1))
+        with self.assertNumQueries(len(before)):
+            self.client.get(url, {'from': '2025-08-01'})
+
+
+class ExportTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('auditor', password='secret')
+        self.client.force_login(user)
+
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(text)))
+
+    def test_ledger_export_respects_date_range(self):
+        response = self.client.get(reverse('ledger-export', args=[self.cash.pk]), {'from': '2025-01-01'})
+        rows = self.read_csv(response)
+        self.assertEqual(rows[1][2:], ['Opening Balance', '', '', '1000.00'])
+        self.assertEqual(rows[-1][-1], '1600.00')
+        self.assertEqual(len(rows), 5)
+
+    def test_trial_balance_export_totals(self):
+        rows = self.read_csv(self.client.get(reverse('trial-balance-export'), {'date': '2025-01-31'}))
+        self.assertEqual(rows[-1], ['Total', '', '1500.00', '1500.00'])
+
+    def test_journal_export_uses_search(self):
+        post_journal([(self.rent, 5, 0), (self.cash, 0, 5)], description='Office rent')
+        rows = self.read_csv(self.client.get(reverse('journal-export'), {'search': 'office'}))
+        self.assertEqual([row[2] for row in rows[1:]], ['Office rent'])
+
+
+class JournalImportTests(LedgerTestCase):
+    CSV = (
+        "journal,date,description,status,account,debit,credit\n"
+        "1,2025-03-01,Cash sale,Posted,Cash,250,\n"
+        "1,2025-03-01,Cash sale,Posted,sales,,250\n"
+        "2,2025-03-02,Unbalanced,Posted,Cash,10,\n"
+        "2,2025-03-02,Unbalanced,Posted,Sales,,9\n"
+        "3,2025-03-03,Both sides,Posted,Cash,5,5\n"
+        "3,2025-03-03,Both sides,Posted,Sales,,5\n"
+        "4,2025-03-04,One line,Posted,Cash,5,\n"
+        "5,2025-03-05,Unknown,Posted,Petty cash,5,\n"
+        "5,2025-03-05,Unknown,Posted,Sales,,5\n"
+        "6,2025-13-01,Bad date,Posted,Cash,5,\n"
+        "7,2025-03-07,Draft plan,Draft,Rent,40,\n"
+        "7,2025-03-07,Draft plan,Draft,Cash,,30\n"
+        "8,2025-03-08,Negative,Posted,Cash,-5,\n"
+        "8,2025-03-08,Negative,Posted,Sales,,-5\n"
+    )
+
+    def test_csv_import_inserts_valid_journals_and_reports_rows(self):
+        report = import_journals(io.StringIO(self.CSV), 'csv', batch_size=2)
+        self.assertEqual(report.journals, 2)
+        self.assertEqual(report.lines, 4)
+        self.assertEqual([error['row'] for error in report.errors], [4, 6, 8, 9, 11, 14])
+        self.assertIn('Unbalanced', report.errors[0]['message'])
+        self.assertEqual(report.errors[1]['message'], "Enter either Debit or Credit, not both.")
+        self.assertEqual(report.errors[5]['message'], "Negative amounts are not allowed.")
+
+        sale = Journal.objects.get(description='Cash sale')
+        self.assertEqual(set(sale.transactions.values_list('posted_date', flat=True)), {date(2025, 3, 1)})
+        self.assertFalse(Journal.objects.get(description='Draft plan').transactions.filter(posted_date__isnull=False).exists())
+        self.assertEqual(check_period_balances(), [])
+        self.assertEqual([pk for pk, rank in rank_journals('cash sale')][0], sale.pk)
+
+    def test_json_lines_endpoint(self):
+        user = User.objects.create_user('clerk', password='secret')
+        self.client.force_login(user)
+        body = '\n'.join([
+            json.dumps({'date': '2025-04-01', 'description': 'Loan draw', 'lines': [
+                {'account': self.cash.pk, 'debit': '100'}, {'account': 'Bank Loan', 'credit': 100},
+            ]}),
+            '{not json',
+        ])
+        upload = SimpleUploadedFile('journals.jsonl', body.encode())
+        response = self.client.post(reverse('journal-import'), {'file': upload})
+        data = response.json()
+        self.assertEqual((data['journals'], data['lines']), (1, 2))
+        self.assertEqual(data['errors'], [{'row': 2, 'message': 'Malformed journal record.'}])
+        self.assertEqual(self.loan.get_balance(), Decimal('400'))
+
+    def test_dry_run_inserts_nothing(self):
+        count = Journal.objects.count()
+        report = import_journals(io.StringIO(self.CSV), 'csv', dry_run=True)
+        self.assertEqual(report.journals, 2)
+        self.assertEqual(Journal.objects.count(), count)
+
+
+class SyntheticLedgerTests(LedgerTestCase):
+    def test_generated_ledger_is_balanced_and_consistent(self):
+        report = generate_ledger(600, accounts=12, lines_per_journal=4, years=3, draft_ratio=0.2, seed=1)
+        self.assertEqual((report.journals, report.lines, report.errors), (150, 600, []))
+        self.assertEqual(Account.objects.count(), 12)  # Cash, Rent etc. from the fixture are reused
+        journals = Journal.objects.annotate(debit=Sum('transactions__debit'), credit=Sum('transactions__credit'))
+        self.assertTrue(all(journal.debit == journal.credit for journal in journals))
+        self.assertEqual(set(journals.values_list('status', flat=True)), {'Posted', 'Draft'})
+        self.assertGreaterEqual(len(Journal.objects.dates('date', 'year')), 3)
+        self.assertEqual(check_period_balances(), [])
+
+    def test_benchmark_covers_views_and_flags_regressions(self):
+        generate_ledger(90, accounts=10)
+        client = self.client
+        client.force_login(User.objects.create_user('auditor', password='secret'))
+        views = benchmark_views(client, repeat=1)
+        self.assertIn('trial-balance', views)
+        self.assertIn('ledger from=%d-01-01 to=%d-12-31' % ((date.today().year - 1,) * 2), views)
+        self.assertNotIn('journal-delete', views)
+        self.assertTrue(all(result['status'] == 200 for result in views.values()), views)
+
+        baseline = {'sizes': {'100': {'views': views}}}
+        slower = {
+            label: dict(result, ms=result['ms'] * 3 + 10, queries=result['queries'] + (label == 'dashboard'))
+            for label, result in views.items()
+        }
+        problems = find_regressions({'sizes': {'100': {'views': slower}}}, baseline)
+        self.assertEqual(len(problems), len(views) + 1)
+        self.assertEqual(find_regressions(baseline, baseline), [])
+
+
+class RequestProfilingTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('auditor', password='secret'))
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+    def test_header_and_log_line(self):
+        with self.assertLogs('accounting.profiling', 'INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('trial-balance'))
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertIn('db-pool;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'trial-balance')
+        self.assertEqual((record['status'], record['queries'], record['repeated']), (200, len(queries), []))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertIn('pool_wait_ms', record)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0, REQUEST_PROFILING_REPEAT_THRESHOLD=1)
+    def test_repeated_statement_is_flagged(self):
+        def balances_one_by_one(*args, **kwargs):
+            rows = balances_as_of(*args, **kwargs)
+            for row in rows:
+                Account.objects.get(pk=row.id)
+            return rows
+
+        with mock.patch('accounting.views.balances_as_of', balances_one_by_one), \
+                self.assertLogs('accounting.profiling', 'INFO') as logs:
+            self.client.get(reverse('account-balance-api', args=[self.cash.pk]))
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        repeated = json.loads(logs.records[0].getMessage())['repeated']
+        self.assertEqual(repeated[0]['times'], Account.objects.count())
+        self.assertIn('accounting_account', repeated[0]['sql'])
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_pass_through(self):
+        response = self.client.get(reverse('trial-balance'))
+        self.assertNotIn('Server-Timing', response)
+
+
+# A separate (non-mirror) "replica" test database, as in AccountingProject.test_settings
+SEPARATE_REPLICA = 'replica' in settings.DATABASES and not settings.DATABASES['replica'].get('TEST', {}).get('MIRROR')
+
+
+@skipUnless(SEPARATE_REPLICA, "needs a separate 'replica' test database")
+@override_settings(REPORT_REPLICA_ALIAS='replica')
+class ReplicaRoutingTests(LedgerTestCase):
+    """The "replica" test database holds different rows from "default", so each page shows where it read."""
+
+    databases = {'default', 'replica'} if SEPARATE_REPLICA else {'default'}
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('auditor', password='secret'))
+        self.replica_account = Account.objects.using('replica').create(
+            name='Replica Cash', account_type='Asset', debit_total=75,
+        )
+        AccountPeriodBalance.objects.using('replica').create(
+            account=self.replica_account, period=date(2025, 1, 1), debit=75, credit=0,
+        )
+
+    def asset_names(self):
+        return {row.name for row in self.client.get(reverse('balance-sheet')).context['assets']}
+
+    def test_report_reads_go_to_the_replica(self):
+        self.assertEqual(self.asset_names(), {'Replica Cash'})
+        assets = self.client.get(reverse('balance-sheet-async')).context['assets']
+        self.assertEqual({row.name for row in assets}, {'Replica Cash'})
+        response = self.client.get(reverse('account-balance-api', args=[self.replica_account.pk]))
+        self.assertEqual(response.json()['balance'], 75.0)
+        accounts = self.client.get(reverse('account-list')).context['accounts']
+        self.assertIn('Cash', {account.name for account in accounts})  # not a report page
+
+    def test_session_stays_on_primary_after_a_write(self):
+        self.client.post(reverse('journal-create'), self.journal_post_data([(self.cash, 5, 0), (self.sales, 0, 5)]))
+        self.assertIn('Cash', self.asset_names())
+
+        session = self.client.session
+        session[PIN_SESSION_KEY] = 0
+        session.save()
+        self.assertEqual(self.asset_names(), {'Replica Cash'})
+
+    def test_reads_after_a_write_in_the_same_request_use_primary(self):
+        router = ReportReplicaRouter()
+
+        with tracking_writes() as wrote, reading_from_replica():
+            self.assertEqual(router.db_for_read(Account), 'replica')
+            Account.objects.create(name='Petty Cash', account_type='Asset')
+            self.assertTrue(wrote())
+            self.assertIsNone(router.db_for_read(Account))
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Pooled SQLite wrappers on a scratch database, standing in for the pooled MySQL backend."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'pool.sqlite3')
+        self.alias = f'pool-{self._testMethodName}'
+        self.addCleanup(close_pool, self.alias)
+
+    def wrapper(self, **pool):
+        settings_dict = {
+            'ENGINE': 'accounting.db.sqlite3', 'NAME': self.path, 'USER': '', 'PASSWORD': '', 'HOST': '',
+            'PORT': '', 'ATOMIC_REQUESTS': False, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True, 'OPTIONS': {}, 'TIME_ZONE': None, 'TEST': {}, 'POOL': pool,
+        }
+        wrapper = PooledSQLiteWrapper(settings_dict, self.alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_closed_connections_are_reused(self):
+        first = self.wrapper(MAX_SIZE=2)
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        second = self.wrapper(MAX_SIZE=2)
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        self.assertEqual({k: v for k, v in second.pool.stats().items() if k in ('created', 'reused')},
+                         {'created': 1, 'reused': 1})
+
+    def test_size_cap_times_out_and_records_waits(self):
+        first = self.wrapper(MAX_SIZE=1, TIMEOUT=0.05)
+        first.ensure_connection()
+        with self.assertRaises(OperationalError):
+            self.wrapper(MAX_SIZE=1, TIMEOUT=0.05).ensure_connection()
+
+        first.pool.timeout = 2
+        first.inc_thread_sharing()
+        threading.Timer(0.1, first.close).start()
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertGreaterEqual(second.connection_wait, 0.05)
+        self.assertEqual(second.pool.stats()['timeouts'], 1)
+
+    def test_expired_and_broken_connections_are_replaced(self):
+        first = self.wrapper(MAX_AGE=None)
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        raw.close()  # e.g. dropped by the server while idle
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        second.close()
+
+        second.pool.max_age = 0
+        raw = second.connection
+        third = self.wrapper()
+        third.ensure_connection()
+        self.assertIsNot(third.connection, raw)
+        self.assertEqual(third.pool.stats()['discarded'], 2)
+
+    def test_mysql_health_check_drops_dead_connections_without_reconnecting(self):
+        wrapper = PooledMySQLWrapper({**self.wrapper().settings_dict, 'ENGINE': 'accounting.db.mysql'}, self.alias)
+        dead, fresh = mock.Mock(), mock.Mock()
+        dead.ping.side_effect = OperationalError('gone away')
+        opened = iter([dead, fresh])
+        pool = ConnectionPool()
+        connection, waited = pool.acquire(lambda: next(opened))
+        pool.release(connection)
+
+        connection, waited = pool.acquire(lambda: next(opened), wrapper.ping_connection)
+        self.assertIs(connection, fresh)
+        dead.ping.assert_called_once_with(reconnect=False)
+        dead.close.assert_called_once_with()
+        self.assertEqual((pool.stats()['size'], pool.stats()['discarded']), (1, 1))
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        first = self.wrapper()
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TABLE entry (id integer)')
+        first.set_autocommit(False)
+        with first.cursor() as cursor:
+            cursor.execute('INSERT INTO entry VALUES (1)')
+        first.close()
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM entry')
+            self.assertEqual(cursor.fetchone(), (0,))
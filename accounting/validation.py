@@ -0,0 +1,36 @@
+"""
+Journal validation rules shared by the journal form and the bulk importer.
+"""
+
+MIN_LINES = 2
+BALANCE_TOLERANCE = 0.01
+
+
+def line_error(account, debit, credit):
+    """Error message for one transaction line, or None when it is acceptable."""
+    if (debit > 0 or credit > 0) and not account:
+        return "Please select an account."
+    if debit > 0 and credit > 0:
+        return "Enter either Debit or Credit, not both."
+    if debit < 0 or credit < 0:
+        return "Negative amounts are not allowed."
+    return None
+
+
+def journal_error(status, valid_lines, total_debit, total_credit):
+    """Error message for a journal's non-empty lines taken together, or None."""
+    if valid_lines < MIN_LINES:
+        return "At least 2 valid lines required."
+    if status == 'Posted' and abs(total_debit - total_credit) > BALANCE_TOLERANCE:
+        return f"Unbalanced! Dr: {total_debit}, Cr: {total_credit}"
+    return None
+
+
+def closed_period_error(closed_through, *days):
+    """Error message when any of `days` falls in a fiscal year closed (see accounting.closing), or None."""
+    if closed_through and any(day and day.year <= closed_through for day in days):
+        return (
+            f"Fiscal year {closed_through} is closed; journals dated on or before "
+            f"31 December {closed_through} cannot be changed."
+        )
+    return None
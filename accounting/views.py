@@ -4,19 +4,45 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
-from django.http import JsonResponse
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from functools import partial, wraps
+import io
 import json
-from django.db.models import Q, Sum
-from django.db.models.functions import TruncMonth
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from datetime import datetime
-from django.views.decorators.http import require_GET
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET, require_POST
 from .models import Account
 
 
 # Import Forms and Models
 from .forms import JournalForm, TransactionFormSet, UserRegistrationForm, AccountForm
-from .models import Journal, Transaction, Account, CompanySettings
+from .models import Journal, Transaction, Account, CompanySettings, DEBIT_NORMAL_TYPES, signed_balance
+from .balances import (
+    PERIOD_MONTHS, ZERO, ComparativeBalance, balance_tree, balances_as_of, comparative_balances, dashboard_figures,
+    journal_balances, parse_report_date, period_balances, period_buckets, period_label, subtree_balances,
+    total_balance, totals_before,
+)
+from .closing import without_closing_entries
+from .concurrency import run_concurrently
+from .exports import CHUNK_SIZE, amount, csv_response
+from .importer import import_journals
+from .ledger import (
+    bump_ledger_version, journal_postings, last_closed_year, ledger_version, lock_journals, record_posting_change,
+)
+from .pagination import PAGE_SIZE, KeysetPage, keyset_paginate
+from .report_cache import report_cache
+from .routers import replica_reads
+from .search import index_journals, matching_journals, rank_journals, reindex_account
+from .validation import closed_period_error, journal_error
+
+LEDGER_PAGE_SIZE = 100
+LINE_BATCH_SIZE = 500
+AUTOCOMPLETE_PAGE_SIZE = 20
 
 
 # ==========================================
@@ -39,7 +65,7 @@ def register_view(request):
     else:
         form = UserRegistrationForm()
     
-    company = CompanySettings.objects.first()
+    company = CompanySettings.current()
     return render(request, 'register.html', {'form': form, 'company': company})
 
 
@@ -60,7 +86,7 @@ def login_view(request):
     else:
         form = AuthenticationForm()
     
-    company = CompanySettings.objects.first()
+    company = CompanySettings.current()
     return render(request, 'login.html', {'form': form, 'company': company})
 
 
@@ -76,18 +102,10 @@ def logout_view(request):
 # 2. DASHBOARD WITH YEAR FILTER
 # ==========================================
 @login_required
+@replica_reads
 def dashboard_view(request):
     try:
-        company = CompanySettings.objects.first()
-        accounts = Account.objects.all()
-        
-        total_assets = 0
-        total_liabilities = 0
-        total_revenue = 0
-        total_expense = 0
-        
-        expense_labels = []
-        expense_data = []
+        company = CompanySettings.current()
         
         # ✅ NEW: Get year from request, default to current year
         selected_year = request.GET.get('year')
@@ -101,68 +119,22 @@ def dashboard_view(request):
         else:
             selected_year = current_year
         
-        #  NEW: Get available years from database
-        available_years = Transaction.objects.filter(
-            journal__status='Posted'
-        ).dates('journal__date', 'year')
-        
-        # Extract unique years and sort in descending order
-        available_years = sorted(set([d.year for d in available_years]), reverse=True)
-        
-        # === Monthly Revenue & Expense Calculation ===
-        monthly_revenue = [0] * 12
-        monthly_expense = [0] * 12
-        
-       
-        rev_data = Transaction.objects.filter(
-            account__account_type='Revenue',
-            journal__status='Posted',
-            journal__date__year=selected_year  
-        ).annotate(
-            month_num=TruncMonth('journal__date')
-        ).values('month_num').annotate(
-            total=Sum('credit')
-        )
-        
-        for item in rev_data:
-            if item['month_num']:
-                idx = item['month_num'].month - 1
-                monthly_revenue[idx] = float(item['total'] or 0)
-        
-        
-        exp_data = Transaction.objects.filter(
-            account__account_type='Expense',
-            journal__status='Posted',
-            journal__date__year=selected_year 
-        ).annotate(
-            month_num=TruncMonth('journal__date')
-        ).values('month_num').annotate(
-            total=Sum('debit')
-        )
-        
-        for item in exp_data:
-            if item['month_num']:
-                idx = item['month_num'].month - 1
-                monthly_expense[idx] = float(item['total'] or 0)
-
-        # Dashboard KPI Calculations
-        for acc in accounts:
-            balance = acc.get_balance() 
-            
-            if acc.account_type == 'Asset':
-                total_assets += balance
-            elif acc.account_type == 'Liability':
-                total_liabilities += balance
-            elif acc.account_type == 'Revenue':
-                total_revenue += balance
-            elif acc.account_type == 'Expense':
-                total_expense += balance
-                if balance > 0:
-                    expense_labels.append(acc.name)
-                    expense_data.append(float(balance))
-
+        data = dashboard_data(selected_year)
+        accounts = data['accounts']
+        type_balances = data['type_balances']
+        total_assets = type_balances.get('Asset', 0)
+        total_liabilities = type_balances.get('Liability', 0)
+        total_revenue = type_balances.get('Revenue', 0)
+        total_expense = type_balances.get('Expense', 0)
         net_profit = total_revenue - total_expense
 
+        expense_labels = []
+        expense_data = []
+        for row in accounts:
+            if row.account_type == 'Expense' and row.balance > 0:
+                expense_labels.append(row.name)
+                expense_data.append(float(row.balance))
+
         context = {
             'company': company,
             'total_assets': total_assets,
@@ -173,10 +145,10 @@ def dashboard_view(request):
             'accounts': accounts,
             'expense_labels': json.dumps(expense_labels),
             'expense_data': json.dumps(expense_data),
-            'monthly_revenue': json.dumps(monthly_revenue),
-            'monthly_expense': json.dumps(monthly_expense),
+            'monthly_revenue': json.dumps(data['monthly_revenue']),
+            'monthly_expense': json.dumps(data['monthly_expense']),
             'selected_year': selected_year,       
-            'available_years': available_years,  
+            'available_years': data['available_years'],  
             'current_year': current_year,
         }
         return render(request, 'dashboard.html', context)
@@ -185,6 +157,20 @@ def dashboard_view(request):
         return render(request, 'dashboard.html', {})
 
 
+def dashboard_data(year):
+    """Dashboard figures for `year`, cached per ledger version so reloads skip the ledger."""
+    def compute():
+        data = dashboard_figures(year)
+        data['accounts'] = balances_as_of()
+        return data
+    return report_cache.get('dashboard', year, compute)
+
+
+def report_date(value):
+    """The ?date= filter as a date (None when blank), used as the report cache key."""
+    return parse_report_date(value) if value else None
+
+
 # ==========================================
 # 3. JOURNAL MANAGEMENT
 # ==========================================
@@ -204,6 +190,7 @@ def update_journal_view(request, pk):
 @login_required
 def handle_journal_form(request, journal=None, title="", button_text=""):
     if request.method == "POST":
+        original_date = journal.date if journal else None  # is_valid() copies the new date onto the instance
         form = JournalForm(request.POST, instance=journal)
         formset = TransactionFormSet(request.POST, instance=journal)
         
@@ -217,7 +204,7 @@ def handle_journal_form(request, journal=None, title="", button_text=""):
 
             total_debit = 0
             total_credit = 0
-            valid_lines = 0
+            line_forms = []
 
             for line_form in formset:
                 if line_form.cleaned_data and not line_form.cleaned_data.get('DELETE'):
@@ -226,33 +213,30 @@ def handle_journal_form(request, journal=None, title="", button_text=""):
                     if debit == 0 and credit == 0: continue
                     total_debit += debit
                     total_credit += credit
-                    valid_lines += 1
-
-            if valid_lines < 2:
-                messages.error(request, "At least 2 valid lines required.")
-                return render(request, 'journal_form.html', {'form': form, 'formset': formset, 'title': title, 'button_text': button_text})
+                    line_forms.append(line_form)
 
-            if status == 'Posted' and abs(total_debit - total_credit) > 0.01:
-                messages.error(request, f"Unbalanced! Dr: {total_debit}, Cr: {total_credit}")
+            error = journal_error(status, len(line_forms), total_debit, total_credit) or closed_period_error(
+                last_closed_year(), original_date, form.cleaned_data['date'],
+            )
+            if error:
+                messages.error(request, error)
                 return render(request, 'journal_form.html', {'form': form, 'formset': formset, 'title': title, 'button_text': button_text})
 
             try:
                 with transaction.atomic():
+                    if journal and not lock_journals([journal.pk]):
+                        messages.error(request, "This journal was deleted while you were editing it.")
+                        return redirect('journal-list')
+                    before = journal_postings([journal.pk]) if journal else {}
                     journal_obj = form.save(commit=False)
                     journal_obj.status = status
                     journal_obj.save()
                     
-                    if journal: journal.transactions.all().delete()
+                    existing_ids = {line.pk for line in formset.get_queryset()} if journal else set()
+                    save_journal_lines(journal_obj, line_forms, existing_ids)
                     
-                    for line_form in formset:
-                        if line_form.cleaned_data and not line_form.cleaned_data.get('DELETE'):
-                            debit = line_form.cleaned_data.get('debit') or 0
-                            credit = line_form.cleaned_data.get('credit') or 0
-                            if debit == 0 and credit == 0: continue
-                            
-                            line = line_form.save(commit=False)
-                            line.journal = journal_obj
-                            line.save()
+                    record_posting_change(before, journal_postings([journal_obj.pk]))
+                    index_journals([journal_obj.pk])
                     
                     messages.success(request, msg)
                     return redirect('journal-list')
@@ -267,28 +251,159 @@ def handle_journal_form(request, journal=None, title="", button_text=""):
     return render(request, 'journal_form.html', {'form': form, 'formset': formset, 'title': title, 'button_text': button_text})
 
 
+def save_journal_lines(journal, line_forms, existing_ids):
+    """
+    Write the submitted lines of `journal` as a diff against its existing
+    line ids: one bulk_update for changed lines, one bulk_create for new
+    ones and one DELETE for the rest, however many lines there are.
+    Unchanged lines keep their rows and ids.
+    """
+    changed, added, kept = [], [], set()
+    for line_form in line_forms:
+        line = line_form.save(commit=False)
+        line.journal = journal
+        line.posted_date = journal.posted_date  # bulk writes skip Transaction.save()
+        if line.pk in existing_ids:
+            kept.add(line.pk)
+            if line_form.has_changed():
+                changed.append(line)
+        else:
+            added.append(line)
+
+    removed = existing_ids - kept
+    if removed:
+        Transaction.objects.filter(journal=journal, pk__in=removed).delete()
+    if changed:
+        Transaction.objects.bulk_update(changed, ['account', 'debit', 'credit'], batch_size=LINE_BATCH_SIZE)
+    if added:
+        Transaction.objects.bulk_create(added, batch_size=LINE_BATCH_SIZE)
+
+
 @login_required
 def journal_list_view(request):
+    selected_date, search_query, journals = filter_journals(request)
+    with_totals = annotate_line_totals(journals)
+
+    if search_query:
+        page = search_page(
+            search_query, journals, with_totals, after=request.GET.get('after'), before=request.GET.get('before'),
+        )
+        total = matching_journals(search_query, journals).count()
+    else:
+        page = keyset_paginate(
+            with_totals, ('date', 'id'),
+            after=request.GET.get('after'), before=request.GET.get('before'), descending=True,
+        )
+        total = journals.count()
+
+    return render(request, 'journal_list.html', {
+        'journals': page, 'page': page, 'total': total,
+        'next_query': page_query(request, after=page.next_cursor),
+        'previous_query': page_query(request, before=page.previous_cursor),
+        'selected_date': selected_date, 'search_query': search_query,
+    })
+
+
+@login_required
+def journal_export_view(request):
+    """CSV of the journal list, honouring the same date and search filters."""
+    selected_date, search_query, journals = filter_journals(request)
+    if search_query:
+        journals = journals.filter(pk__in=matching_journals(search_query, journals))
+    journals = annotate_line_totals(journals).order_by('-date', '-id').values_list(
+        'id', 'date', 'description', 'status', 'line_count', 'total_amount'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    rows = (
+        (pk, day, description or '', status, lines, amount(total))
+        for pk, day, description, status, lines, total in journals
+    )
+    return csv_response('journals.csv', ['Journal', 'Date', 'Description', 'Status', 'Lines', 'Amount'], rows)
+
+
+def search_page(search_query, journals, with_totals, after=None, before=None, per_page=PAGE_SIZE):
+    """
+    One page of ranked matches from the token index, best first. A rank has
+    no (date, id) key to seek on, so the cursors are positions in the ranking.
+    """
+    start = search_position(after)
+    if after is None and before is not None:
+        start = max(search_position(before) - per_page, 0)
+    ranked = rank_journals(search_query, journals, limit=per_page + 1, offset=start)
+    found = with_totals.in_bulk([pk for pk, rank in ranked[:per_page]])
+    return KeysetPage(
+        [found[pk] for pk, rank in ranked[:per_page] if pk in found],
+        next_cursor=str(start + per_page) if len(ranked) > per_page else None,
+        previous_cursor=str(start) if start else None,
+    )
+
+
+def search_position(cursor):
+    try:
+        return max(int(cursor), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def filter_journals(request):
+    """The journal list's date/search parameters and its date-filtered queryset."""
     selected_date = request.GET.get('date', '').strip()
     search_query = request.GET.get('search', '').strip()
-    journals = Journal.objects.all().order_by('-date', '-id')
-
+    journals = Journal.objects.all()
     if selected_date:
         journals = journals.filter(date=selected_date)
-    if search_query:
-        journals = journals.filter(
-            Q(description__icontains=search_query) |
-            Q(transactions__account__name__icontains=search_query)
-        ).distinct()
+    return selected_date, search_query, journals
+
 
-    return render(request, 'journal_list.html', {'journals': journals, 'selected_date': selected_date, 'search_query': search_query})
+def annotate_line_totals(journals):
+    return journals.annotate(
+        total_amount=Coalesce(Sum('transactions__debit'), Value(0), output_field=DecimalField()),
+        line_count=Count('transactions'),
+    )
+
+
+def page_query(request, **cursor):
+    """Current GET parameters with the page cursor swapped for `cursor` (None if there is no such page)."""
+    name, value = next(iter(cursor.items()))
+    if value is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[name] = value
+    return params.urlencode()
+
+
+@login_required
+@require_POST
+def import_journals_view(request):
+    """Bulk import an uploaded CSV / JSON Lines file; responds with the per-row error report."""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'status': 'error', 'message': 'No file uploaded'}, status=400)
+    fmt = request.POST.get('format') or ('jsonl' if upload.name.endswith(('.jsonl', '.json')) else 'csv')
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = import_journals(stream, fmt, dry_run=bool(request.POST.get('dry_run')))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **report.as_dict()})
 
 
 @login_required
 def delete_journal_view(request, pk):
     journal = get_object_or_404(Journal, pk=pk)
     if request.method == "POST":
-        journal.delete()
+        error = closed_period_error(last_closed_year(), journal.date)
+        if error:
+            messages.error(request, error)
+            return redirect('journal-list')
+        with transaction.atomic():
+            if not lock_journals([journal.pk]):
+                messages.error(request, 'Journal was already deleted.')
+                return redirect('journal-list')
+            before = journal_postings([journal.pk])
+            journal.delete()
+            record_posting_change(before, {})
         messages.success(request, 'Journal deleted!')
         return redirect('journal-list')
     return render(request, 'journal_confirm_delete.html', {'journal': journal})
@@ -311,27 +426,45 @@ def create_account_ajax(request):
             if Account.objects.filter(name__iexact=name).exists():
                 return JsonResponse({'status': 'error', 'message': 'Account exists!'})
             
-            account = Account.objects.create(name=name, account_type=account_type)
+            with transaction.atomic():
+                account = Account.objects.create(name=name, account_type=account_type)
+                bump_ledger_version()
             return JsonResponse({'status': 'success', 'id': account.id, 'name': account.name})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)})
     return JsonResponse({'status': 'error', 'message': 'Invalid request'})
 
 
+@login_required
+@require_GET
+def account_autocomplete(request):
+    """Accounts whose name starts with ?q= (case-insensitive), in select2's {results, pagination} format."""
+    term = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    start = (page - 1) * AUTOCOMPLETE_PAGE_SIZE
+    accounts = list(Account.objects.filter(name__istartswith=term).order_by('name').values_list(
+        'pk', 'name', 'account_type'
+    )[start:start + AUTOCOMPLETE_PAGE_SIZE + 1])
+    return JsonResponse({
+        'results': [
+            {'id': pk, 'text': name, 'type': account_type}
+            for pk, name, account_type in accounts[:AUTOCOMPLETE_PAGE_SIZE]
+        ],
+        'pagination': {'more': len(accounts) > AUTOCOMPLETE_PAGE_SIZE},
+    })
+
+
 @login_required
 def account_list_view(request):
     search_query = request.GET.get('search', '').strip()
-    accounts = Account.objects.all().order_by('account_type', 'name')
+    accounts = Account.objects.all().order_by('account_type', 'path')
     if search_query:
         accounts = accounts.filter(Q(name__icontains=search_query) | Q(account_type__icontains=search_query))
     
-    account_data = []
-    for account in accounts:
-        balance = account.get_balance() 
-        account_data.append({
-            'id': account.id, 'name': account.name, 'account_type': account.account_type,
-            'balance': balance, 'balance_abs': abs(balance), 'is_negative': balance < 0,
-        })
+    account_data = subtree_balances(accounts)
     
     return render(request, 'account_list.html', {'accounts': account_data, 'search_query': search_query})
 
@@ -342,7 +475,12 @@ def manage_account_view(request, pk=None):
     title = "Edit Account" if pk else "Add New Account"
     form = AccountForm(request.POST or None, instance=account)
     if request.method == "POST" and form.is_valid():
-        form.save()
+        renamed = account is not None and 'name' in form.changed_data
+        with transaction.atomic():
+            account = form.save()
+            bump_ledger_version()
+            if renamed:
+                reindex_account(account.pk)
         messages.success(request, 'Account saved!')
         return redirect('account-list')
     return render(request, 'account_form.html', {'form': form, 'title': title})
@@ -353,7 +491,9 @@ def delete_account_view(request, pk):
     account = get_object_or_404(Account, pk=pk)
     if request.method == "POST":
         try:
-            account.delete()
+            with transaction.atomic():
+                account.delete()
+                bump_ledger_version()
             messages.success(request, 'Account deleted!')
         except:
             messages.error(request, 'Cannot delete used account.')
@@ -366,60 +506,97 @@ def delete_account_view(request, pk):
 
 
 @login_required
+@replica_reads
 def ledger_view(request, account_id):
     account = get_object_or_404(Account, pk=account_id)
-    transactions = Transaction.objects.filter(account=account, journal__status='Posted').select_related('journal').order_by('journal__date', 'id')
+    date_from = optional_date(request.GET.get('from'))
+    date_to = optional_date(request.GET.get('to'))
     
-    balance = 0
+    transactions = Transaction.objects.filter(account=account, posted_date__isnull=False)
+    if date_from:
+        transactions = transactions.filter(posted_date__gte=date_from)
+    if date_to:
+        transactions = transactions.filter(posted_date__lte=date_to)
+    
+    # Only the visible slice is fetched; the running balance is seeded from
+    # everything posted before the page's first line.
+    page = keyset_paginate(
+        transactions.select_related('journal'), ('posted_date', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'), per_page=LEDGER_PAGE_SIZE,
+    )
+    if page.items:
+        first = page.items[0]
+        opening = signed_balance(account.account_type, *totals_before(account.id, first.posted_date, first.id))
+    elif date_from:
+        opening = signed_balance(account.account_type, *totals_before(account.id, date_from))
+    else:
+        opening = 0
+    
+    balance = opening
     ledger_data = []
     
-    for t in transactions:
-        if account.account_type in ['Asset', 'Expense']:
-            balance += (t.debit - t.credit)
-        else:
-            balance += (t.credit - t.debit)
+    for t in page:
+        balance += signed_balance(account.account_type, t.debit, t.credit)
         
         ledger_data.append({
             'date': t.journal.date, 'description': t.journal.description,
             'journal_ref': t.journal.id, 'debit': t.debit, 'credit': t.credit, 'balance': balance
         })
     
-    return render(request, 'ledger.html', {'account': account, 'ledger_data': ledger_data, 'current_balance': balance})
+    current_balance = balances_as_of(date_to, accounts=Account.objects.filter(pk=account.pk))[0].balance
+    
+    return render(request, 'ledger.html', {
+        'account': account, 'ledger_data': ledger_data, 'current_balance': current_balance,
+        'opening_balance': opening, 'page': page,
+        'next_query': page_query(request, after=page.next_cursor),
+        'previous_query': page_query(request, before=page.previous_cursor),
+        'date_from': date_from, 'date_to': date_to,
+    })
+
+
+@login_required
+def ledger_export_view(request, account_id):
+    """CSV of an account ledger with running balance, for the same from/to range as ledger_view."""
+    account = get_object_or_404(Account, pk=account_id)
+    date_from = optional_date(request.GET.get('from'))
+    date_to = optional_date(request.GET.get('to'))
+    
+    transactions = Transaction.objects.filter(account=account, posted_date__isnull=False)
+    if date_from:
+        transactions = transactions.filter(posted_date__gte=date_from)
+    if date_to:
+        transactions = transactions.filter(posted_date__lte=date_to)
+    opening = signed_balance(account.account_type, *totals_before(account.id, date_from)) if date_from else 0
+    
+    def rows():
+        balance = opening
+        yield (date_from or '', '', 'Opening Balance', '', '', amount(balance))
+        lines = transactions.order_by('posted_date', 'id').values_list(
+            'posted_date', 'journal_id', 'journal__description', 'debit', 'credit'
+        ).iterator(chunk_size=CHUNK_SIZE)
+        for posted_date, journal_id, description, debit, credit in lines:
+            balance += signed_balance(account.account_type, debit, credit)
+            yield (posted_date, journal_id, description or '', amount(debit), amount(credit), amount(balance))
+    
+    filename = f"ledger_{account.pk}.csv"
+    return csv_response(filename, ['Date', 'Journal', 'Description', 'Debit', 'Credit', 'Balance'], rows())
+
+
+def optional_date(value):
+    """Parse a YYYY-MM-DD query parameter, ignoring blank or malformed values."""
+    try:
+        return parse_report_date(value) if value else None
+    except ValueError:
+        return None
 
 
 @login_required
+@replica_reads
 def trial_balance_view(request):
     """Trial Balance with Date Filter"""
     selected_date = request.GET.get('date')
     
-    accounts = Account.objects.all()
-    trial_balance = []
-    total_debit = 0
-    total_credit = 0
-    
-    for account in accounts:
-        balance = account.get_balance(selected_date)
-        
-        if balance == 0: continue
-        
-        entry = {'account': account.name, 'type': account.account_type, 'debit': 0, 'credit': 0}
-        
-        if account.account_type in ['Asset', 'Expense']:
-            if balance >= 0:
-                entry['debit'] = balance
-                total_debit += balance
-            else:
-                entry['credit'] = abs(balance)
-                total_credit += abs(balance)
-        else:
-            if balance >= 0:
-                entry['credit'] = balance
-                total_credit += balance
-            else:
-                entry['debit'] = abs(balance)
-                total_debit += abs(balance)
-        
-        trial_balance.append(entry)
+    trial_balance, total_debit, total_credit = cached_trial_balance(selected_date)
     
     return render(request, 'trial_balance.html', {
         'trial_balance': trial_balance, 
@@ -430,70 +607,430 @@ def trial_balance_view(request):
 
 
 @login_required
+def trial_balance_export_view(request):
+    """CSV of the trial balance for the same ?date= filter."""
+    selected_date = request.GET.get('date')
+    trial_balance, total_debit, total_credit = cached_trial_balance(selected_date)
+    rows = [
+        (e['account'], e['type'], amount(e['debit']), amount(e['credit']))
+        for e in trial_balance if e['debit'] or e['credit']  # parents with no postings of their own add nothing
+    ]
+    rows.append(('Total', '', amount(total_debit), amount(total_credit)))
+    return csv_response('trial_balance.csv', ['Account', 'Type', 'Debit', 'Credit'], rows)
+
+
+def cached_trial_balance(selected_date):
+    as_of = report_date(selected_date)
+    return report_cache.get('trial-balance', as_of, lambda: build_trial_balance(balances_as_of(as_of)))
+
+
+def build_trial_balance(rows):
+    """
+    Debit/credit columns for every non-zero balance row, in chart order,
+    plus the column totals. Parent accounts also carry their subtree's
+    rolled-up columns; the totals add up the accounts' own columns only.
+    """
+    trial_balance = []
+    total_debit = 0
+    total_credit = 0
+    
+    for account in balance_tree(rows):
+        if account.balance == 0: continue
+        
+        debit, credit = trial_balance_columns(account.account_type, account.own.balance)
+        subtree_debit, subtree_credit = trial_balance_columns(account.account_type, account.balance)
+        trial_balance.append({
+            'account': account.name, 'type': account.account_type, 'debit': debit, 'credit': credit,
+            'id': account.id, 'path': account.path, 'depth': account.depth, 'has_children': account.has_children,
+            'subtree_debit': subtree_debit, 'subtree_credit': subtree_credit,
+        })
+        total_debit += debit
+        total_credit += credit
+    
+    return trial_balance, total_debit, total_credit
+
+
+def trial_balance_columns(account_type, balance):
+    """(debit, credit) for a signed balance: its normal side when positive, the other side when negative."""
+    if (account_type in DEBIT_NORMAL_TYPES) == (balance >= 0):
+        return abs(balance), 0
+    return 0, abs(balance)
+
+
+@login_required
+@replica_reads
 def income_statement_view(request):
-    """Income Statement with Date Filter"""
+    """Income Statement with Date Filter; ?from= narrows it to that period's figures"""
     selected_date = request.GET.get('date')
+    selected_from = request.GET.get('from')
     
-    revenues = Account.objects.filter(account_type='Revenue')
-    expenses = Account.objects.filter(account_type='Expense')
+    as_of = report_date(selected_date)
+    try:
+        comparison = comparative_periods(request, as_of)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if comparison:
+        return render(request, 'comparative_report.html', comparative_report('income-statement', *comparison, selected_date))
+
+    try:
+        date_from = report_date(selected_from)
+    except ValueError:
+        return HttpResponseBadRequest(f"Invalid from date {selected_from!r}")
+    rows = report_cache.get(
+        'income-statement', income_statement_key(as_of, date_from),
+        lambda: income_statement_rows(as_of, date_from),
+    )
+    return render(request, 'income_statement.html', income_statement_context(rows, selected_date, selected_from))
+
+
+def income_statement_rows(as_of, date_from=None):
+    """Revenue and Expense rows: totals up to `as_of`, or the movements over [date_from, as_of]."""
+    if date_from:
+        rows = period_balances(date_from, as_of, account_types=['Revenue', 'Expense'])
+    else:
+        rows = balances_as_of(as_of, account_types=['Revenue', 'Expense'])
+    return without_closing_entries(rows, as_of, date_from)
+
+
+def income_statement_key(as_of, date_from):
+    return (date_from, as_of) if date_from else as_of
+
+
+def income_statement_context(rows, selected_date, selected_from=None):
+    revenues = [row for row in rows if row.account_type == 'Revenue']
+    expenses = [row for row in rows if row.account_type == 'Expense']
     
-    total_revenue = sum(a.get_balance(selected_date) for a in revenues)
-    total_expense = sum(a.get_balance(selected_date) for a in expenses)
+    total_revenue = total_balance(revenues)
+    total_expense = total_balance(expenses)
     net_profit = total_revenue - total_expense
 
-    return render(request, 'income_statement.html', {
+    return {
         'revenues': revenues, 'expenses': expenses,
         'total_revenue': total_revenue, 'total_expense': total_expense, 
         'net_profit': net_profit,
-        'selected_date': selected_date
-    })
+        'selected_date': selected_date, 'selected_from': selected_from,
+    }
 
 
 @login_required
+@replica_reads
 def balance_sheet_view(request):
     """Balance Sheet with Date Filter"""
     selected_date = request.GET.get('date')
     
+    as_of = report_date(selected_date)
+    try:
+        comparison = comparative_periods(request, as_of)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if comparison:
+        return render(request, 'comparative_report.html', comparative_report('balance-sheet', *comparison, selected_date))
+
+    rows = report_cache.get('balance-sheet', as_of, lambda: balances_as_of(as_of))
+    return render(request, 'balance_sheet.html', balance_sheet_context(rows, selected_date))
+
+
+def balance_sheet_context(rows, selected_date):
     # Calculate Net Profit upto date
-    rev_total = sum(a.get_balance(selected_date) for a in Account.objects.filter(account_type='Revenue'))
-    exp_total = sum(a.get_balance(selected_date) for a in Account.objects.filter(account_type='Expense'))
+    rev_total = total_balance(rows, 'Revenue')
+    exp_total = total_balance(rows, 'Expense')
     net_profit = rev_total - exp_total
     
-    assets = Account.objects.filter(account_type='Asset')
-    liabilities = Account.objects.filter(account_type='Liability')
-    equity = Account.objects.filter(account_type='Equity')
+    tree = balance_tree(rows)
+    assets = [row for row in tree if row.account_type == 'Asset']
+    liabilities = [row for row in tree if row.account_type == 'Liability']
+    equity = [row for row in tree if row.account_type == 'Equity']
     
-    total_assets = sum(a.get_balance(selected_date) for a in assets)
-    total_liabilities = sum(a.get_balance(selected_date) for a in liabilities)
-    capital_base = sum(a.get_balance(selected_date) for a in equity)
+    total_assets = total_balance(rows, 'Asset')
+    total_liabilities = total_balance(rows, 'Liability')
+    capital_base = total_balance(rows, 'Equity')
     
     total_equity_with_profit = capital_base + net_profit
     total_liab_equity = total_liabilities + total_equity_with_profit
     
-    return render(request, 'balance_sheet.html', {
+    return {
         'assets': assets, 'liabilities': liabilities, 'equity_accounts': equity,
         'net_profit': net_profit, 'total_assets': total_assets,
         'total_liabilities': total_liabilities, 'capital_base': capital_base,
         'total_equity_with_profit': total_equity_with_profit,
         'total_liab_equity': total_liab_equity,
         'selected_date': selected_date
-    })
+    }
+
+
+# Comparative mode (?compare=month|quarter|year&periods=N): one column per
+# period, every column from the same single pivoted query.
+
+COMPARE_PERIODS = 12
+MAX_COMPARE_PERIODS = 36
+
+
+def comparative_periods(request, as_of):
+    """(unit, periods) asked for by ?compare= and ?periods=, or None for the single-date report."""
+    unit = request.GET.get('compare')
+    if not unit:
+        return None
+    if unit not in PERIOD_MONTHS:
+        raise ValueError(f"Unknown comparison period {unit!r}")
+    count = min(max(int(request.GET.get('periods') or COMPARE_PERIODS), 1), MAX_COMPARE_PERIODS)
+    return unit, period_buckets(as_of or datetime.now().date(), unit, count)
+
+
+def column_totals(rows, columns):
+    return [sum((row.balances[i] for row in rows), ZERO) for i in range(columns)]
+
+
+def comparative_income_statement(unit, periods):
+    """Revenue and Expense movements over each period, closing entries left out."""
+    rows = comparative_balances(periods, account_types=['Revenue', 'Expense'], exclude_closing=True)
+    revenues = [row for row in rows if row.account_type == 'Revenue' and any(row.balances)]
+    expenses = [row for row in rows if row.account_type == 'Expense' and any(row.balances)]
+    total_revenue = column_totals(revenues, len(periods))
+    total_expense = column_totals(expenses, len(periods))
+    return {
+        'title': 'Comparative Income Statement',
+        'columns': [period_label(start, unit) for start, end in periods],
+        'sections': [
+            {'title': 'Revenue', 'rows': revenues, 'total': total_revenue},
+            {'title': 'Operating Expenses', 'rows': expenses, 'total': total_expense},
+        ],
+        'results': [('Net Profit', [revenue - expense for revenue, expense in zip(total_revenue, total_expense)])],
+    }
+
+
+def comparative_balance_sheet(unit, periods):
+    """Balances at the end of each period, with the profit to date shown under equity."""
+    rows = [row for row in comparative_balances(periods, cumulative=True) if any(row.balances)]
+    columns = len(periods)
+    by_type = {account_type: [row for row in rows if row.account_type == account_type]
+               for account_type in ('Asset', 'Liability', 'Equity', 'Revenue', 'Expense')}
+    net_profit = [
+        revenue - expense for revenue, expense in
+        zip(column_totals(by_type['Revenue'], columns), column_totals(by_type['Expense'], columns))
+    ]
+    equity = by_type['Equity'] + [ComparativeBalance(None, 'Net Profit', 'Equity', net_profit)]
+    total_liabilities = column_totals(by_type['Liability'], columns)
+    total_equity = column_totals(equity, columns)
+    return {
+        'title': 'Comparative Balance Sheet',
+        'columns': [period_label(start, unit) for start, end in periods],
+        'sections': [
+            {'title': 'Assets', 'rows': by_type['Asset'], 'total': column_totals(by_type['Asset'], columns)},
+            {'title': 'Liabilities', 'rows': by_type['Liability'], 'total': total_liabilities},
+            {'title': 'Equity', 'rows': equity, 'total': total_equity},
+        ],
+        'results': [('Total Liabilities & Equity', [
+            liabilities + equity for liabilities, equity in zip(total_liabilities, total_equity)
+        ])],
+    }
+
+
+COMPARATIVE_REPORTS = {
+    'income-statement': comparative_income_statement,
+    'balance-sheet': comparative_balance_sheet,
+}
+
+
+def comparative_report(report, unit, periods, selected_date):
+    """Template context of a comparative `report`, cached per ledger version like the single-date reports."""
+    context = report_cache.get(
+        f'{report}-comparative', (unit, tuple(periods)), partial(COMPARATIVE_REPORTS[report], unit, periods)
+    )
+    return {**context, 'selected_date': selected_date, 'compare': unit, 'period_count': len(periods)}
 
 
 @require_GET
+@replica_reads
 def account_balance_api(request, account_id):
-    try:
-        account = Account.objects.get(id=account_id)
-        current_balance = account.get_balance()
-        
-        return JsonResponse({
-            'status': 'success',
-            'balance': float(current_balance),
-            'account_name': account.name,
-            'account_type': account.account_type
-        })
-    except Account.DoesNotExist:
+    return balance_response(cached_account_balances().get(account_id))
+
+
+def cached_account_balances(as_of=None, status='Posted'):
+    """{account id: AccountBalance} for the whole chart, cached per ledger version."""
+    def compute():
+        if status == 'Posted':
+            rows = balances_as_of(as_of)
+        else:
+            rows = journal_balances(as_of, None if status == 'All' else status)
+        return {row.id: row for row in rows}
+    return report_cache.get('account-balances', (as_of, status), compute)
+
+
+def balance_json(account):
+    return {
+        'balance': float(account.balance),
+        'account_name': account.name,
+        'account_type': account.account_type
+    }
+
+
+def balance_response(account):
+    if account is None:
         return JsonResponse({
             'status': 'error',
             'message': 'Account not found'
         }, status=404)
+
+    return JsonResponse({'status': 'success', **balance_json(account)})
+
+
+BATCH_BALANCE_LIMIT = 500
+BALANCE_STATUSES = ('Posted', 'Draft', 'All')
+
+
+def ledger_etag(request, *args, **kwargs):
+    # Every journal and account change bumps the ledger version
+    return f'"ledger-{ledger_version()}"'
+
+
+@login_required
+@require_GET
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@etag(ledger_etag)
+def account_balances_api(request):
+    """Balances of several accounts (?ids=1,2,3) as of ?date= for ?status= Posted (default), Draft or All."""
+    try:
+        ids = [int(value) for param in request.GET.getlist('ids') for value in param.split(',') if value.strip()]
+        as_of = report_date(request.GET.get('date'))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid account ids or date'}, status=400)
+    status = request.GET.get('status') or 'Posted'
+    if status not in BALANCE_STATUSES:
+        return JsonResponse({'status': 'error', 'message': f'Unknown status {status!r}'}, status=400)
+    if len(ids) > BATCH_BALANCE_LIMIT:
+        return JsonResponse(
+            {'status': 'error', 'message': f'At most {BATCH_BALANCE_LIMIT} accounts per request'}, status=400
+        )
+
+    balances = cached_account_balances(as_of, status)
+    return JsonResponse({
+        'status': 'success',
+        'date': as_of.isoformat() if as_of else None,
+        'journal_status': status,
+        'balances': {str(pk): balance_json(balances[pk]) for pk in ids if pk in balances},
+        'missing': [pk for pk in ids if pk not in balances],
+    })
+
+
+# ==========================================
+# 6. ASYNC REPORTS (for ASGI deployments)
+# ==========================================
+# Same pages and JSON as section 5, but each independent section of a
+# report is aggregated on its own connection at the same time (see
+# accounting.concurrency), and no worker thread is held while waiting.
+
+def covering_sections(*sections):
+    """`sections` plus one more holding every account type they leave out, so no account is dropped."""
+    listed = {account_type for section in sections for account_type in section}
+    rest = [account_type for account_type, label in Account.ACCOUNT_TYPES if account_type not in listed]
+    return [list(section) for section in sections] + ([rest] if rest else [])
+
+
+# These share report_cache entries with the sync views, so they must cover the whole chart
+BALANCE_SHEET_SECTIONS = covering_sections(['Asset'], ['Liability'], ['Equity'], ['Revenue', 'Expense'])
+TRIAL_BALANCE_SECTIONS = covering_sections(['Asset', 'Expense'], ['Liability', 'Equity', 'Revenue'])
+
+
+def async_login_required(view):
+    """login_required for coroutine views; Django 4.2's decorator only wraps sync views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # request.user loads the session and user lazily, which is database work
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def balances_by_section(as_of, sections):
+    """balances_as_of() for each group of account types, run concurrently, merged in account order."""
+    results = await run_concurrently(*(
+        partial(balances_as_of, as_of, account_types=account_types) for account_types in sections
+    ))
+    return sorted((row for rows in results for row in rows), key=lambda row: row.id)
+
+
+async def render_async(request, template_name, context):
+    # Context processors may query the database
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@async_login_required
+@replica_reads
+async def trial_balance_async_view(request):
+    selected_date = request.GET.get('date')
+    as_of = report_date(selected_date)
+
+    async def compute():
+        return build_trial_balance(await balances_by_section(as_of, TRIAL_BALANCE_SECTIONS))
+
+    trial_balance, total_debit, total_credit = await report_cache.aget('trial-balance', as_of, compute)
+    return await render_async(request, 'trial_balance.html', {
+        'trial_balance': trial_balance, 'total_debit': total_debit, 'total_credit': total_credit,
+        'selected_date': selected_date,
+    })
+
+
+@async_login_required
+@replica_reads
+async def income_statement_async_view(request):
+    selected_date = request.GET.get('date')
+    selected_from = request.GET.get('from')
+    as_of = report_date(selected_date)
+    try:
+        comparison = comparative_periods(request, as_of)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if comparison:
+        context = await sync_to_async(comparative_report)('income-statement', *comparison, selected_date)
+        return await render_async(request, 'comparative_report.html', context)
+
+    try:
+        date_from = report_date(selected_from)
+    except ValueError:
+        return HttpResponseBadRequest(f"Invalid from date {selected_from!r}")
+
+    async def compute():
+        if date_from:
+            # Period figures are a single grouped query
+            return await sync_to_async(income_statement_rows)(as_of, date_from)
+        rows = await balances_by_section(as_of, [['Revenue'], ['Expense']])
+        return await sync_to_async(without_closing_entries)(rows, as_of)
+
+    rows = await report_cache.aget('income-statement', income_statement_key(as_of, date_from), compute)
+    return await render_async(
+        request, 'income_statement.html', income_statement_context(rows, selected_date, selected_from)
+    )
+
+
+@async_login_required
+@replica_reads
+async def balance_sheet_async_view(request):
+    selected_date = request.GET.get('date')
+    as_of = report_date(selected_date)
+    try:
+        comparison = comparative_periods(request, as_of)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if comparison:
+        context = await sync_to_async(comparative_report)('balance-sheet', *comparison, selected_date)
+        return await render_async(request, 'comparative_report.html', context)
+
+    rows = await report_cache.aget(
+        'balance-sheet', as_of, lambda: balances_by_section(as_of, BALANCE_SHEET_SECTIONS)
+    )
+    return await render_async(request, 'balance_sheet.html', balance_sheet_context(rows, selected_date))
+
+
+@replica_reads
+async def account_balance_async_api(request, account_id):
+    if request.method != 'GET':  # require_GET only wraps sync views in Django 4.2
+        return HttpResponseNotAllowed(['GET'])
+
+    async def compute():
+        rows = await balances_by_section(None, BALANCE_SHEET_SECTIONS)
+        return {row.id: row for row in rows}
+
+    balances = await report_cache.aget('account-balances', (None, 'Posted'), compute)
+    return balance_response(balances.get(account_id))